@@ -1,62 +1,41 @@
 import logging
 import os
+import signal
+import sys
 
 from dotenv import load_dotenv
-from slack_bolt import App
-from slack_bolt.adapter.socket_mode import SocketModeHandler
 
-load_dotenv()
+from handlers import register_handlers
+from utils import log, metrics, migrations, runtime, workers
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("slack.log"), logging.StreamHandler()],
-)
-
-app = App(token=os.environ.get("SLACK_BOT_TOKEN"))
-
-
-def register_handlers(app: App):
-    from handlers import (
-        ai,
-        fun,
-        help,
-        join_manager,
-        leveling,
-        message_dispatcher,
-        miscellaneous,
-        welcome,
-        xkcd,
-    )
-
-    logging.info("Registering handlers...")
-    ai.register(app)
-    logging.debug("Registered ai handlers")
-    fun.register(app)
-    logging.debug("Registered fun handlers")
-    help.register(app)
-    logging.debug("Registered help handlers")
-    join_manager.register(app)
-    logging.debug("Registered join_manager handlers")
-    leveling.register(app)
-    logging.debug("Registered leveling handlers")
-    miscellaneous.register(app)
-    logging.debug("Registered miscellaneous handlers")
-    welcome.register(app)
-    logging.debug("Registered welcome handlers")
-    xkcd.register(app)
-    logging.debug("Registered xkcd handlers")
-    message_dispatcher.register(app)
-    logging.debug("Registered message dispatcher")
-    logging.info("All handlers registered successfully")
+load_dotenv()
 
+log.setup(processes=int(os.getenv("BOT_WORKERS", "1")))
 
+app = runtime.create_app(os.environ.get("SLACK_BOT_TOKEN"))
 register_handlers(app)
 
 
+def start_background_services():
+    metrics.start_server()
+    # Schema checks share one connection and overlap opening Socket Mode.
+    migrations.migrate_in_background()
+
+
 if __name__ == "__main__":
+    # stop.sh sends SIGTERM; exit normally so buffered XP and the thread index are saved.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    worker_count = int(os.getenv("BOT_WORKERS", "1"))
     logging.info("Initializing Socket Mode handler...")
-    handler = SocketModeHandler(app, os.environ["SLACK_APP_TOKEN"])
     logging.info("Starting Dragon Bot for Slack...")
     logging.info("Bot is now running and listening for events")
-    handler.start()
+    if worker_count > 1:
+        workers.run_supervisor(
+            app,
+            os.environ["SLACK_APP_TOKEN"],
+            worker_count,
+            on_start=start_background_services,
+        )
+    else:
+        start_background_services()
+        runtime.start(app, os.environ["SLACK_APP_TOKEN"])
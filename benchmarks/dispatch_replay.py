@@ -0,0 +1,152 @@
+"""Replay a realistic message mix through the dispatcher and report per-event CPU.
+
+Compares the routed dispatcher against the previous behaviour, where every
+event went to every branch and each branch re-checked ``bot_id``, ``subtype``,
+``thread_ts``, ``channel_type`` and the chat channel itself. Branch bodies are
+no-ops so only classification, routing and fan-out are measured.
+
+    uv run python -m benchmarks.dispatch_replay --events 20000
+"""
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from handlers import message_dispatcher
+
+CHAT = "CCHAT"
+
+_legacy_fast = ThreadPoolExecutor(max_workers=8)
+_legacy_slow = ThreadPoolExecutor(max_workers=4)
+
+
+def make_events(count: int, seed: int = 1) -> list[dict]:
+    """Build a mix of bot, edited, threaded and plain messages."""
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        roll = rng.random()
+        channel = CHAT if rng.random() < 0.5 else "COTHER"
+        event = {
+            "type": "message",
+            "channel": channel,
+            "channel_type": "channel",
+            "user": f"U{rng.randrange(500)}",
+            "text": rng.choice(
+                [
+                    "hey has anyone tried the new python release?",
+                    "lgtm, merging",
+                    "the dragon is back",
+                    "check https://hackclub.slack.com/archives/C1/p1",
+                    "lunch?",
+                ]
+            ),
+            "ts": f"{1700000000 + i}.000100",
+        }
+        if roll < 0.30:
+            event["bot_id"] = "B1"
+        elif roll < 0.40:
+            event = {
+                "type": "message",
+                "subtype": "message_changed",
+                "channel": channel,
+                "channel_type": "channel",
+                "message": dict(event),
+                "ts": event["ts"],
+            }
+        elif roll < 0.45:
+            event["channel_type"] = "im"
+        elif roll < 0.70:
+            event["thread_ts"] = f"{1700000000 + i - 5}.000100"
+        events.append(event)
+    return events
+
+
+def _noop(*args):
+    pass
+
+
+def legacy_dispatch(event, say, client, context):
+    """The pre-routing flow: four branches per event, each doing its own checks."""
+
+    def fun_branch():
+        text = event.get("text", "").lower()
+        if event.get("bot_id"):
+            return
+        text.count("python")
+
+    def ai_branch():
+        if not event.get("thread_ts"):
+            return
+        if event.get("bot_id") or event.get("subtype"):
+            return
+        if event.get("channel_type", "") in ("im", "mpim"):
+            return
+        if event.get("channel") != CHAT:
+            return
+        event.get("text", "")
+
+    def leveling_branch():
+        if event.get("bot_id") or event.get("subtype"):
+            return
+        event.get("user")
+
+    def misc_branch():
+        text = event.get("text", "")
+        if event.get("bot_id"):
+            return
+        text.count("<!subteam^")
+
+    futures = [
+        _legacy_fast.submit(fun_branch),
+        _legacy_slow.submit(ai_branch),
+        _legacy_fast.submit(leveling_branch),
+        _legacy_fast.submit(misc_branch),
+    ]
+    for future in futures:
+        future.result()
+
+
+def _subscribe_noop_branches():
+    message_dispatcher.CHAT_CHANNEL = CHAT
+    subscribe = message_dispatcher.subscribe
+    subscribe("fun", _noop, workload="fun", kinds=("plain", "content"))
+    subscribe("ai", _noop, workload="ai", threads=True, channels=("chat",))
+    subscribe("leveling", _noop, workload="xp")
+    subscribe("miscellaneous", _noop, kinds=("plain", "content"))
+
+
+def _measure(dispatch, events) -> float:
+    started = time.process_time()
+    for event in events:
+        dispatch(event, None, None, None)
+    return (time.process_time() - started) / len(events) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    # Queue every branch rather than shedding, so both paths do the same work.
+    os.environ["WORKLOAD_POOLS"] = ",".join(
+        f"{name}=8/{args.events * 2}" for name in ("instant", "ai", "db")
+    )
+    events = make_events(args.events)
+    _subscribe_noop_branches()
+
+    # Warm both paths (thread start-up, route cache) before measuring.
+    _measure(legacy_dispatch, events[:500])
+    _measure(message_dispatcher.dispatch_message, events[:500])
+
+    legacy = _measure(legacy_dispatch, events)
+    routed = _measure(message_dispatcher.dispatch_message, events)
+    print(f"events:  {len(events)}")
+    print(f"legacy:  {legacy:.1f} us CPU/event")
+    print(f"routed:  {routed:.1f} us CPU/event ({(1 - routed / legacy) * 100:.0f}% less)")
+
+
+if __name__ == "__main__":
+    main()
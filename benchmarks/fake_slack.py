@@ -0,0 +1,336 @@
+"""Local stand-in for Slack (Web API, Socket Mode, response_url), the AI proxy and the other APIs.
+
+Start it, point the bot at it and drive load through the Socket Mode connection:
+
+    uv run python -m benchmarks.fake_slack --port 3000 --synthetic 5000 --rate 100
+    SLACK_API_URL=http://127.0.0.1:3000/api/ \\
+    AI_API_URL=http://127.0.0.1:3000/proxy/v1/chat/completions \\
+    HTTP_REDIRECT_URL=http://127.0.0.1:3000/ext \\
+    SLACK_BOT_TOKEN=xoxb-fake SLACK_APP_TOKEN=xapp-fake uv run app.py
+
+The search, quote, joke, animal and xkcd APIs are answered under ``/ext/<host>/``
+with canned responses after ``--http-ms``, so nothing leaves the machine.
+
+Web API methods are rate limited by Slack's tiers (`chat.postMessage` per
+channel) and answer `429 ratelimited` with `Retry-After` once a bucket is empty.
+Envelopes not acked within 3 seconds are redelivered, like Slack does. When the
+load has been sent and settled it prints ack latency and per-method call and
+429 counts. Without a load it serves until interrupted.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+import uuid
+from collections import Counter
+from urllib.parse import parse_qs
+
+from aiohttp import WSMsgType, web
+
+from benchmarks import replay, stubs
+
+ACK_TIMEOUT = 3.0
+MAX_RETRIES = 3
+
+# Requests per minute for each Web API tier.
+TIERS = {1: 1, 2: 20, 3: 50, 4: 100}
+METHOD_TIERS = {
+    "auth.test": 4,
+    "chat.delete": 3,
+    "chat.update": 3,
+    "conversations.invite": 3,
+    "conversations.replies": 3,
+    "files.completeUploadExternal": 4,
+    "files.getUploadURLExternal": 4,
+    "reactions.add": 3,
+    "usergroups.users.list": 2,
+    "usergroups.users.update": 2,
+    "users.info": 4,
+    "views.open": 4,
+}
+# chat.postMessage: about one message per second per channel, with short bursts.
+POST_MESSAGE_RATE = 1.0
+POST_MESSAGE_BURST = 3
+
+
+class Bucket:
+    """Token bucket; ``take`` returns 0 on success, else seconds until a token frees up."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def envelope_type(body: dict) -> str:
+    if body.get("command"):
+        return "slash_commands"
+    if body.get("type") == "event_callback":
+        return "events_api"
+    return "interactive"
+
+
+class FakeSlack:
+    def __init__(self, slack_ms: float, ai_ms: float, http_ms: float, limit_scale: float):
+        self.slack_ms = slack_ms
+        self.ai_ms = ai_ms
+        self.http_ms = http_ms
+        self.limit_scale = limit_scale
+        self.url = ""
+        self.buckets: dict[str, Bucket] = {}
+        self.calls = Counter()
+        self.limited = Counter()
+        self.sockets: list[web.WebSocketResponse] = []
+        self.connected = asyncio.Event()
+        self.pending: dict[str, asyncio.Future] = {}
+        self.ack_latency: list[float] = []
+        self.retries = 0
+        self.unacked = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/api/{method}", self.web_api)
+        app.router.add_get("/link/", self.socket_mode)
+        app.router.add_post("/respond", self.ok)
+        app.router.add_post("/upload", self.ok)
+        app.router.add_post("/proxy/v1/chat/completions", self.ai)
+        app.router.add_route("*", "/ext/{host}/{path:.*}", self.external)
+        return app
+
+    async def _params(self, request: web.Request) -> dict:
+        params = dict(request.query)
+        raw = await request.text()
+        if request.content_type == "application/json" and raw:
+            params.update(json.loads(raw))
+        elif request.content_type == "application/x-www-form-urlencoded":
+            params.update({k: v[0] for k, v in parse_qs(raw).items()})
+        return params
+
+    def _retry_after(self, method: str, params: dict) -> float:
+        if not self.limit_scale:
+            return 0.0
+        if method == "chat.postMessage":
+            key = f"{method}:{params.get('channel')}"
+            rate, capacity = POST_MESSAGE_RATE, POST_MESSAGE_BURST
+        elif method in METHOD_TIERS:
+            key = method
+            per_minute = TIERS[METHOD_TIERS[method]]
+            rate, capacity = per_minute / 60, per_minute
+        else:
+            return 0.0
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = Bucket(
+                rate * self.limit_scale, max(1, capacity * self.limit_scale)
+            )
+        return bucket.take()
+
+    async def web_api(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls[method] += 1
+        if method == "apps.connections.open":
+            ws_url = self.url.replace("http://", "ws://")
+            return web.json_response(
+                {"ok": True, "url": f"{ws_url}/link/?ticket={uuid.uuid4()}"}
+            )
+        wait = self._retry_after(method, params)
+        if wait:
+            self.limited[method] += 1
+            return web.json_response(
+                {"ok": False, "error": "ratelimited"},
+                status=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+        await asyncio.sleep(self.slack_ms / 1000)
+        return web.json_response(stubs.slack_payload(self.url, method, params))
+
+    async def ok(self, request: web.Request) -> web.Response:
+        await request.read()
+        self.calls[request.path] += 1
+        await asyncio.sleep(self.slack_ms / 1000)
+        return web.Response(text="ok")
+
+    async def ai(self, request: web.Request) -> web.StreamResponse:
+        params = await self._params(request)
+        self.calls["ai"] += 1
+        if not params.get("stream"):
+            await asyncio.sleep(self.ai_ms / 1000)
+            return web.json_response(stubs.external_payload("ai.hackclub.com"))
+        events = stubs.ai_stream_events()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for event in events:
+            await asyncio.sleep(self.ai_ms / 1000 / len(events))
+            await response.write(event)
+        await response.write_eof()
+        return response
+
+    async def external(self, request: web.Request) -> web.Response:
+        host = request.match_info["host"]
+        await request.read()
+        self.calls[host] += 1
+        await asyncio.sleep(self.http_ms / 1000)
+        return web.json_response(stubs.external_payload(host))
+
+    async def socket_mode(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(autoping=True)
+        await ws.prepare(request)
+        await ws.send_json(
+            {
+                "type": "hello",
+                "num_connections": len(self.sockets) + 1,
+                "connection_info": {"app_id": "A0"},
+                "debug_info": {"host": "fake-slack"},
+            }
+        )
+        self.sockets.append(ws)
+        self.connected.set()
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                ack = json.loads(msg.data)
+                future = self.pending.get(ack.get("envelope_id"))
+                if future and not future.done():
+                    future.set_result(time.perf_counter())
+        finally:
+            self.sockets.remove(ws)
+            if not self.sockets:
+                self.connected.clear()
+        return ws
+
+    async def deliver(self, body: dict, connection: int):
+        """Send one payload, redelivering it until acked or out of retries."""
+        envelope_id = str(uuid.uuid4())
+        kind = envelope_type(body)
+        for attempt in range(MAX_RETRIES + 1):
+            await self.connected.wait()
+            future = self.pending[envelope_id] = (
+                asyncio.get_running_loop().create_future()
+            )
+            ws = self.sockets[connection % len(self.sockets)]
+            sent = time.perf_counter()
+            await ws.send_json(
+                {
+                    "envelope_id": envelope_id,
+                    "type": kind,
+                    "payload": body,
+                    "accepts_response_payload": kind != "events_api",
+                    "retry_attempt": attempt,
+                    "retry_reason": "timeout" if attempt else "",
+                }
+            )
+            try:
+                acked = await asyncio.wait_for(future, ACK_TIMEOUT)
+                self.ack_latency.append(acked - sent)
+                return
+            except TimeoutError:
+                self.retries += 1
+            finally:
+                self.pending.pop(envelope_id, None)
+        self.unacked += 1
+
+    async def drive(self, bodies: list[dict], rate: float):
+        await self.connected.wait()
+        started = time.perf_counter()
+        tasks = []
+        for i, body in enumerate(bodies):
+            if "response_url" in body:
+                body["response_url"] = f"{self.url}/respond"
+            delay = started + (i / rate if rate else 0) - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.deliver(body, i)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+    def report(self, sent: int, elapsed: float):
+        acked = len(self.ack_latency)
+        print(
+            f"{sent} envelopes in {elapsed:.2f}s: {acked} acked, {self.unacked} unacked, "
+            f"{self.retries} redelivered"
+        )
+        if acked:
+            p50, p95, p99 = (
+                replay._percentile(self.ack_latency, pct) * 1000 for pct in (50, 95, 99)
+            )
+            print(f"ack latency: p50 {p50:.1f}ms  p95 {p95:.1f}ms  p99 {p99:.1f}ms")
+        print(f"{'method':<32} {'calls':>7} {'429s':>6}")
+        for method, count in sorted(self.calls.items()):
+            print(f"{method:<32} {count:>7} {self.limited[method]:>6}")
+
+
+async def serve(args):
+    fake = FakeSlack(args.slack_ms, args.ai_ms, args.http_ms, args.limit_scale)
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    fake.url = f"http://{args.host}:{args.port}"
+    print(f"Fake Slack listening on {fake.url} (SLACK_API_URL={fake.url}/api/)")
+
+    if args.recording or args.synthetic:
+        bodies = (
+            replay.load(args.recording)
+            if args.recording
+            else replay.synthetic(args.synthetic)
+        )
+        elapsed = await fake.drive(bodies, args.rate)
+        # Let in-flight listeners finish their Web API calls before reporting.
+        calls = -1
+        while calls != sum(fake.calls.values()):
+            calls = sum(fake.calls.values())
+            await asyncio.sleep(args.settle)
+        fake.report(len(bodies), elapsed)
+    else:
+        await asyncio.Event().wait()
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", nargs="?", help="JSONL written with RECORD_EVENTS")
+    parser.add_argument(
+        "--synthetic", type=int, default=0, help="send N generated payloads"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=50, help="payloads/s (0: all at once)"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--slack-ms", type=float, default=30)
+    parser.add_argument("--ai-ms", type=float, default=1000)
+    parser.add_argument("--http-ms", type=float, default=50)
+    parser.add_argument(
+        "--limit-scale",
+        type=float,
+        default=1.0,
+        help="multiply rate limits (0 disables them)",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=2.0,
+        help="seconds without Web API calls before reporting",
+    )
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
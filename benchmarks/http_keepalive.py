@@ -0,0 +1,97 @@
+"""Compare bare ``requests.get`` calls against the shared ``utils.http_client`` client.
+
+Fetches the same URL ``--calls`` times from ``--concurrency`` threads, once with
+a new ``requests.get`` per call (how the handlers used to call out) and once
+through ``http_client.client()``, and reports calls/sec, p50/p99 and how many
+connections each opened. By default the URL is served by a local stub with
+``--http-ms`` of latency; point ``--url`` at a real HTTPS API to include TLS.
+
+    uv run python -m benchmarks.http_keepalive --calls 2000 --concurrency 8
+    uv run python -m benchmarks.http_keepalive --url https://xkcd.com/info.0.json --calls 100
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import urllib3.connection
+
+from benchmarks.stubs import StubServer
+from utils import http_client
+
+_opened = 0
+_opened_lock = threading.Lock()
+
+
+def count_connections():
+    """Count every socket urllib3 opens, plain or TLS."""
+    original = urllib3.connection.HTTPConnection._new_conn
+
+    def _new_conn(self):
+        global _opened
+        with _opened_lock:
+            _opened += 1
+        return original(self)
+
+    urllib3.connection.HTTPConnection._new_conn = _new_conn
+
+
+def run(label: str, fetch, url: str, calls: int, concurrency: int):
+    global _opened
+    _opened = 0
+    latencies = []
+
+    def one(_):
+        started = time.perf_counter()
+        fetch(url).raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(calls)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{label:<10} {calls / elapsed:>9,.0f} calls/s  "
+        f"p50 {statistics.median(latencies) * 1000:>7.1f} ms  "
+        f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:>7.1f} ms  "
+        f"{_opened:>5} connections"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL to fetch (default: a local stub)")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--http-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        stub = StubServer(http_ms=args.http_ms)
+        url = f"{stub.url}/ext/xkcd.com/info.0.json"
+    count_connections()
+
+    run(
+        "bare",
+        lambda u: requests.get(u, timeout=30),
+        url,
+        args.calls,
+        args.concurrency,
+    )
+    client = http_client.client()
+    run(
+        "pooled",
+        lambda u: client.get(u, "benchmark"),
+        url,
+        args.calls,
+        args.concurrency,
+    )
+
+
+if __name__ == "__main__":
+    main()
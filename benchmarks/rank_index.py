@@ -0,0 +1,85 @@
+"""Time the XP rank index over a million simulated users.
+
+Loads ``utils.rank.RankIndex`` with a long-tailed XP distribution, then awards
+XP and answers rank queries, the work ``/level`` and the message path do. A
+sorted list kept with ``bisect``, the obvious alternative, is timed alongside.
+
+    uv run python -m benchmarks.rank_index --users 1000000 --ops 100000
+"""
+
+import argparse
+import bisect
+import random
+import time
+
+from handlers import leveling
+from utils.rank import RankIndex
+
+
+def make_xp(users: int) -> list[int]:
+    rng = random.Random(5)
+    return [
+        leveling.XP_PER_MESSAGE * int(rng.paretovariate(1.2) * 5) for _ in range(users)
+    ]
+
+
+def timed(label: str, ops: int, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {ops / elapsed:>12,.0f} ops/s  ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--ops", type=int, default=100_000)
+    args = parser.parse_args()
+
+    xp = make_xp(args.users)
+    rng = random.Random(6)
+    awards = [rng.randrange(args.users) for _ in range(args.ops)]
+    queries = [xp[rng.randrange(args.users)] for _ in range(args.ops)]
+
+    index = RankIndex(leveling.XP_PER_MESSAGE, leveling.RANK_BUCKETS)
+    timed("fenwick load", args.users, lambda: index.load(xp))
+    scores = list(xp)
+
+    def award():
+        for user in awards:
+            index.move(scores[user], scores[user] + leveling.XP_PER_MESSAGE)
+            scores[user] += leveling.XP_PER_MESSAGE
+
+    timed("fenwick award", args.ops, award)
+    timed("fenwick rank", args.ops, lambda: [index.rank(q) for q in queries])
+    print(
+        f"fenwick memory: {index.nbytes / 1024 / 1024:.1f} MiB "
+        f"({index.capacity:,} buckets, top score {max(scores):,} XP)"
+    )
+
+    ordered = sorted(xp)
+    sorted_scores = list(xp)
+    timed("sorted list load", args.users, lambda: sorted(xp))
+
+    def sorted_award():
+        for user in awards:
+            ordered.pop(bisect.bisect_left(ordered, sorted_scores[user]))
+            sorted_scores[user] += leveling.XP_PER_MESSAGE
+            bisect.insort(ordered, sorted_scores[user])
+
+    timed("sorted list award", args.ops, sorted_award)
+    timed(
+        "sorted list rank",
+        args.ops,
+        lambda: [len(ordered) - bisect.bisect_right(ordered, q) + 1 for q in queries],
+    )
+
+    sample = queries[:1000]
+    assert [index.rank(q) for q in sample] == [
+        len(ordered) - bisect.bisect_right(ordered, q) + 1 for q in sample
+    ]
+    print("ranks match")
+
+
+if __name__ == "__main__":
+    main()
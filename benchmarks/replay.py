@@ -0,0 +1,348 @@
+"""Replay Socket Mode payloads through every handler and report per-listener latency.
+
+Record real traffic by running the bot with `RECORD_EVENTS=events.jsonl`, or
+generate a mix of messages, mentions, joins, slash commands, view submissions
+and block actions with `--synthetic`. Slack, the AI proxy, the fun APIs and
+Postgres are replaced by stubs from `benchmarks.stubs` with the given latency,
+so nothing leaves the machine.
+
+    uv run python -m benchmarks.replay events.jsonl --rate 200 --concurrency 32
+    uv run python -m benchmarks.replay --synthetic 2000 --ai-ms 1500 --slack-ms 40
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from slack_bolt import BoltRequest
+from slack_bolt.authorization import AuthorizeResult
+from slack_bolt.request.async_request import AsyncBoltRequest
+
+from benchmarks import stubs
+from utils import executors, metrics
+
+CHAT = "CCHAT"
+TOKEN = "xoxb-replay"
+ENV = {
+    "AI_API_KEY": "replay",
+    "DATABASE_URL": "postgresql://replay",
+    "CHAT_CHANNEL": CHAT,
+    "PING_GROUP_ID": "S0PING",
+    "WELCOME_CHANNEL": "CWELCOME",
+    "OWNER_USER_ID": "UOWNER",
+    "METRICS_PORT": "0",
+    "BOT_THREADS_PATH": "",
+    # Measure the handlers, not Slack's rate limits (benchmarks.fake_slack covers those).
+    "SLACK_RATE_SCALE": "1000",
+}
+LISTENER_KINDS = ("command", "event", "action", "view", "message_branch")
+TEXTS = (
+    "hello everyone",
+    "I have been learning python this week",
+    "the dragon approves of this message",
+    "typescript or javascript for a side project?",
+    "check https://hackclub.slack.com/archives/C1 for details",
+    "has anyone tried the new hackclub hardware grant",
+)
+COMMANDS = (
+    ("/ping", ""),
+    ("/help", ""),
+    ("/joke", ""),
+    ("/rock-paper-scissors", "rock"),
+    ("/quote", ""),
+    ("/dog-picture", ""),
+    ("/xkcd-latest", ""),
+    ("/level", ""),
+    ("/leaderboard", ""),
+    ("/ask-ai", "what is a dragon?"),
+)
+
+
+def _event(i: int, event: dict) -> dict:
+    return {
+        "type": "event_callback",
+        "team_id": "T0",
+        "api_app_id": "A0",
+        "event_id": f"Ev{i:08d}",
+        "event_time": 1700000000 + i,
+        "event": event,
+    }
+
+
+def synthetic(count: int, seed: int = 3) -> list[dict]:
+    """A traffic mix shaped like the bot's busiest channels."""
+    rng = random.Random(seed)
+    bodies = []
+    for i in range(count):
+        ts = f"{1700000000 + i}.{i % 1000000:06d}"
+        user = f"U{rng.randrange(500):03d}"
+        channel = CHAT if rng.random() < 0.6 else f"C{rng.randrange(20):02d}"
+        message = {
+            "type": "message",
+            "channel": channel,
+            "channel_type": "channel",
+            "user": user,
+            "text": rng.choice(TEXTS),
+            "ts": ts,
+            "client_msg_id": f"msg-{i}",
+        }
+        roll = rng.random()
+        if roll < 0.55:
+            bodies.append(_event(i, message))
+        elif roll < 0.65:
+            bodies.append(_event(i, dict(message, thread_ts="1700000000.000100")))
+        elif roll < 0.70:
+            bot = dict(message, bot_id="B2", subtype="bot_message")
+            del bot["user"]
+            bodies.append(_event(i, bot))
+        elif roll < 0.74:
+            edited = {
+                "type": "message",
+                "subtype": "message_changed",
+                "channel": channel,
+                "ts": ts,
+                "message": dict(message, text=message["text"] + " (edited)"),
+            }
+            bodies.append(_event(i, edited))
+        elif roll < 0.79:
+            mention = dict(
+                message, type="app_mention", text="<@UBOT> " + message["text"]
+            )
+            bodies.append(_event(i, mention))
+        elif roll < 0.81:
+            joined = {
+                "type": "member_joined_channel",
+                "user": user,
+                "channel": "CWELCOME",
+                "inviter": "U001",
+            }
+            bodies.append(_event(i, joined))
+        elif roll < 0.95:
+            command, text = rng.choice(COMMANDS)
+            bodies.append(
+                {
+                    "command": command,
+                    "text": text,
+                    "user_id": user,
+                    "channel_id": channel,
+                    "team_id": "T0",
+                    "trigger_id": f"trigger-{i}",
+                    "response_url": "replay://respond",
+                }
+            )
+        elif roll < 0.975:
+            bodies.append(
+                {
+                    "type": "view_submission",
+                    "team": {"id": "T0"},
+                    "user": {"id": user},
+                    "trigger_id": f"trigger-{i}",
+                    "view": {
+                        "id": f"V{i}",
+                        "type": "modal",
+                        "callback_id": "join_request_modal",
+                        "private_metadata": json.dumps(
+                            {"channel_id": "CPRIVATE", "questions": ["Why join?"]}
+                        ),
+                        "state": {
+                            "values": {
+                                "answer_1": {"answer_1_input": {"value": "to learn"}}
+                            }
+                        },
+                    },
+                }
+            )
+        else:
+            action = rng.choice(("join_request_approve", "join_request_deny"))
+            bodies.append(
+                {
+                    "type": "block_actions",
+                    "team": {"id": "T0"},
+                    "user": {"id": "UOWNER"},
+                    "trigger_id": f"trigger-{i}",
+                    "channel": {"id": "CLOG"},
+                    "message": {"ts": ts},
+                    "response_url": "replay://respond",
+                    "actions": [
+                        {
+                            "action_id": action,
+                            "action_ts": ts,
+                            "value": json.dumps(
+                                {"user_id": user, "channel_id": "CPRIVATE"}
+                            ),
+                        }
+                    ],
+                }
+            )
+    return bodies
+
+
+def load(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["body"] for line in f if line.strip()]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _collect_samples() -> dict:
+    """Keep every listener latency sample alongside the usual histograms."""
+    samples = defaultdict(list)
+    observe = metrics.observe
+
+    def recording_observe(kind, name, seconds, error=False):
+        if kind in LISTENER_KINDS:
+            samples[(kind, name)].append(seconds)
+        observe(kind, name, seconds, error)
+
+    metrics.observe = recording_observe
+    return samples
+
+
+def _build_app(runtime_name: str, stub_url: str):
+    from handlers import register_handlers
+    from utils import runtime
+
+    if runtime_name == "async":
+
+        async def authorize(**kwargs):
+            return _authorize()
+
+        app = runtime.create_app(None, runtime="async", authorize=authorize)
+        app.async_app.client.base_url = f"{stub_url}/api/"
+    else:
+        app = runtime.create_app(
+            None, runtime="sync", authorize=_authorize, token_verification_enabled=False
+        )
+    app.client.base_url = f"{stub_url}/api/"
+    register_handlers(app)
+    return app
+
+
+def _authorize(**kwargs):
+    return AuthorizeResult(
+        enterprise_id=None,
+        team_id="T0",
+        bot_token=TOKEN,
+        bot_user_id="UBOT",
+        bot_id="B1",
+    )
+
+
+def _schedule(count: int, rate: float):
+    """Yield the offset in seconds at which each payload should be sent."""
+    for i in range(count):
+        yield i / rate if rate else 0.0
+
+
+def replay_sync(app, bodies, rate, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for body, offset in zip(bodies, _schedule(len(bodies), rate)):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(app.dispatch, BoltRequest(body=body, mode="socket_mode"))
+    return started
+
+
+def replay_async(app, bodies, rate, concurrency):
+    async def main():
+        limit = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+
+        async def send(body):
+            async with limit:
+                await app.async_app.async_dispatch(
+                    AsyncBoltRequest(body=body, mode="socket_mode")
+                )
+
+        tasks = []
+        for body, offset in zip(bodies, _schedule(len(bodies), rate)):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(body)))
+        await asyncio.gather(*tasks)
+        return started
+
+    return asyncio.run(main())
+
+
+def _wait_for_pools():
+    pools = [executors.pool(name) for name in executors.POOLS]
+    while any(pool.pending for pool in pools):
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", nargs="?", help="JSONL written with RECORD_EVENTS")
+    parser.add_argument(
+        "--synthetic", type=int, default=0, help="generate N payloads instead"
+    )
+    parser.add_argument("--runtime", choices=("sync", "async"), default="sync")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="payloads/s (0: as fast as possible)"
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--slack-ms", type=float, default=30)
+    parser.add_argument("--ai-ms", type=float, default=1000)
+    parser.add_argument("--http-ms", type=float, default=100)
+    parser.add_argument("--db-ms", type=float, default=2)
+    args = parser.parse_args()
+    if not args.recording and not args.synthetic:
+        parser.error("pass a recording or --synthetic N")
+
+    # Handler errors still show; per-request info and shedding warnings don't.
+    logging.basicConfig(level=logging.ERROR)
+    for key, value in ENV.items():
+        os.environ.setdefault(key, value)
+    stub = stubs.StubServer(args.slack_ms, args.ai_ms, args.http_ms)
+    stubs.redirect_requests(stub.url)
+    from utils import db
+
+    db.connect = stubs.fake_connect(args.db_ms)
+
+    bodies = load(args.recording) if args.recording else synthetic(args.synthetic)
+    for body in bodies:
+        if "response_url" in body:
+            body["response_url"] = f"{stub.url}/respond"
+
+    samples = _collect_samples()
+    app = _build_app(args.runtime, stub.url)
+    replay = replay_async if args.runtime == "async" else replay_sync
+    started = replay(app, bodies, args.rate, args.concurrency)
+    _wait_for_pools()
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(bodies)} payloads in {elapsed:.2f}s: {len(bodies) / elapsed:.1f}/s")
+    print(f"{'listener':<38} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for (kind, name), values in sorted(samples.items()):
+        p50, p95, p99 = (_percentile(values, pct) * 1000 for pct in (50, 95, 99))
+        print(
+            f"{kind + ' ' + name:<38} {len(values):>6} "
+            f"{p50:>7.1f}ms {p95:>7.1f}ms {p99:>7.1f}ms"
+        )
+    shed = {
+        dict(labels)["pool"]: int(value)
+        for (metric, labels), value in metrics._counters.items()
+        if metric == "pool_rejected_total"
+    }
+    if shed:
+        print(
+            "shed: "
+            + ", ".join(f"{pool}={count}" for pool, count in sorted(shed.items()))
+        )
+
+
+if __name__ == "__main__":
+    main()
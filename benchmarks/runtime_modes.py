@@ -0,0 +1,171 @@
+"""Compare the sync and async runtimes under a burst of slow AI-style commands.
+
+Each run fires a mix of slow commands (a sleep standing in for an AI completion)
+and fast `/ping` commands at the app at once, then reports events/sec and the
+p50/p99 ack latency and `/ping` completion latency for each runtime.
+
+    uv run python -m benchmarks.runtime_modes --events 400 --slow-ratio 0.25
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from slack_bolt import BoltRequest
+from slack_bolt.authorization import AuthorizeResult
+from slack_bolt.request.async_request import AsyncBoltRequest
+
+from utils import dedup, runtime
+
+TOKEN = "xoxb-benchmark"
+
+
+def _authorize(**kwargs):
+    return AuthorizeResult(
+        enterprise_id=None, team_id="T0", bot_token=TOKEN, bot_user_id="U0BOT"
+    )
+
+
+async def _async_authorize(**kwargs):
+    return _authorize()
+
+
+def _command(name: str, i: int) -> dict:
+    return {
+        "token": "x",
+        "team_id": "T0",
+        "channel_id": "C0",
+        "user_id": f"U{i}",
+        "command": name,
+        "text": str(i),
+        "trigger_id": f"trigger-{i}",
+        "response_url": "",
+    }
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _register(app, slow_seconds: float, done: dict):
+    @app.command("/ask-ai", workload="ai")
+    def slow(ack, command):
+        ack()
+        time.sleep(slow_seconds)
+        done[command["text"]] = time.perf_counter()
+
+    @app.command("/ping")
+    def ping(ack, command):
+        ack()
+        done[command["text"]] = time.perf_counter()
+
+
+def _workload(events: int, slow_ratio: float) -> list[dict]:
+    slow_every = max(1, round(1 / slow_ratio)) if slow_ratio else events + 1
+    return [
+        _command("/ask-ai" if i % slow_every == 0 else "/ping", i)
+        for i in range(events)
+    ]
+
+
+def run_sync(bodies, slow_seconds):
+    done, started, acked = {}, {}, {}
+    app = runtime.create_app(
+        None, runtime="sync", authorize=_authorize, token_verification_enabled=False
+    )
+    _register(app, slow_seconds, done)
+
+    def send(body):
+        started[body["text"]] = time.perf_counter()
+        app.dispatch(BoltRequest(body=body, mode="socket_mode"))
+        acked[body["text"]] = time.perf_counter()
+
+    begin = time.perf_counter()
+    # Socket Mode hands each envelope to its own thread, so do the same here.
+    with ThreadPoolExecutor(max_workers=len(bodies)) as pool:
+        list(pool.map(send, bodies))
+    _wait_for(done, len(bodies))
+    return _report("sync", bodies, begin, started, acked, done)
+
+
+def run_async(bodies, slow_seconds):
+    done, started, acked = {}, {}, {}
+    app = runtime.create_app(None, runtime="async", authorize=_async_authorize)
+    _register(app, slow_seconds, done)
+
+    async def send(body):
+        started[body["text"]] = time.perf_counter()
+        await app.async_app.async_dispatch(
+            AsyncBoltRequest(body=body, mode="socket_mode")
+        )
+        acked[body["text"]] = time.perf_counter()
+
+    async def main():
+        await asyncio.gather(*(send(body) for body in bodies))
+        while len(done) < len(bodies):
+            await asyncio.sleep(0.01)
+
+    begin = time.perf_counter()
+    asyncio.run(main())
+    return _report("async", bodies, begin, started, acked, done)
+
+
+def _wait_for(done: dict, count: int):
+    while len(done) < count:
+        time.sleep(0.01)
+
+
+def _report(name, bodies, begin, started, acked, done):
+    elapsed = max(done.values()) - begin
+    ack_ms = [(acked[k] - started[k]) * 1000 for k in started]
+    ping_ms = [
+        (done[b["text"]] - started[b["text"]]) * 1000
+        for b in bodies
+        if b["command"] == "/ping"
+    ]
+    return {
+        "runtime": name,
+        "events_per_sec": len(bodies) / elapsed,
+        "ack_p50_ms": statistics.median(ack_ms),
+        "ack_p99_ms": _percentile(ack_ms, 99),
+        "ping_p50_ms": statistics.median(ping_ms) if ping_ms else 0.0,
+        "ping_p99_ms": _percentile(ping_ms, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--slow-ratio", type=float, default=0.25)
+    parser.add_argument("--slow-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    # Queue the whole burst: this compares runtimes, not load shedding.
+    os.environ["WORKLOAD_POOLS"] = f"ai=4/{args.events},instant=8/{args.events}"
+    bodies = _workload(args.events, args.slow_ratio)
+    slow_seconds = args.slow_ms / 1000
+    print(
+        f"{'runtime':<8} {'events/s':>10} {'ack p50':>9} {'ack p99':>9} "
+        f"{'/ping p50':>10} {'/ping p99':>10}"
+    )
+    results = []
+    for run in (run_sync, run_async):
+        # Both runs replay the same trigger ids; don't let the second look like retries.
+        dedup.seen().clear()
+        results.append(run(bodies, slow_seconds))
+    for result in results:
+        print(
+            f"{result['runtime']:<8} {result['events_per_sec']:>10.1f} "
+            f"{result['ack_p50_ms']:>7.1f}ms {result['ack_p99_ms']:>7.1f}ms "
+            f"{result['ping_p50_ms']:>8.1f}ms {result['ping_p99_ms']:>8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
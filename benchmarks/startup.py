@@ -0,0 +1,108 @@
+"""Measure time-to-first-event for a fresh bot process.
+
+Starts `app.py` in a child interpreter against a local stand-in for the Slack
+Web API, dispatches one `/help` command as soon as handlers are registered and
+reports how long each startup phase took, plus which heavy modules were
+imported before the first event.
+
+    uv run python -m benchmarks.startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import asyncio, json, sys, time
+started = time.time()
+import app
+registered = time.time()
+heavy = sorted(m for m in ("requests", "psycopg2", "pyjokes") if m in sys.modules)
+
+from slack_bolt.request.async_request import AsyncBoltRequest
+
+app.app.client.base_url = sys.argv[1]
+app.app.async_app.client.base_url = sys.argv[1]
+body = {"command": "/help", "user_id": "U1", "channel_id": "C1", "team_id": "T0", "text": ""}
+
+async def first_event():
+    await app.app.async_app.async_dispatch(AsyncBoltRequest(body=body, mode="socket_mode"))
+    while not app.metrics._series.get(("command", "/help")):
+        await asyncio.sleep(0.001)
+
+asyncio.run(first_event())
+print(json.dumps({"started": started, "registered": registered,
+                  "first_event": time.time(), "heavy": heavy}))
+"""
+
+
+class _FakeSlack(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = json.dumps(
+            {"ok": True, "user_id": "UBOT", "bot_id": "B1", "team_id": "T0", "ts": "1.1"}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_once(base_url: str) -> dict:
+    env = dict(
+        os.environ,
+        BOT_RUNTIME="async",
+        SLACK_BOT_TOKEN="xoxb-benchmark",
+        METRICS_PORT="0",
+    )
+    launched = time.time()
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, base_url],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result["launched"] = launched
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeSlack)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/"
+
+    runs = [run_once(base_url) for _ in range(args.runs)]
+    phases = {
+        "interpreter": [(r["started"] - r["launched"]) * 1000 for r in runs],
+        "import + register": [(r["registered"] - r["started"]) * 1000 for r in runs],
+        "first event": [(r["first_event"] - r["registered"]) * 1000 for r in runs],
+        "time-to-first-event": [(r["first_event"] - r["launched"]) * 1000 for r in runs],
+    }
+    for name, values in phases.items():
+        print(f"{name:<20} {statistics.median(values):8.1f} ms (median of {len(values)})")
+    print(f"heavy modules loaded before first event: {', '.join(runs[-1]['heavy']) or 'none'}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
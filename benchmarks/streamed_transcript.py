@@ -0,0 +1,112 @@
+"""Check that a streamed AI reply leaves its thread transcript cached.
+
+Starts a thread with a mention, streams the reply from the stub AI proxy into
+it and feeds every ``chat.update`` back through ``track_thread_messages`` as
+the ``message_changed`` event Slack would send. The follow-up that comes next
+must be answered from the cached transcript, without ``conversations.replies``,
+and the bot's turn in it must be the finished reply.
+
+    uv run python -m benchmarks.streamed_transcript --ai-ms 1000
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks.stubs import StubServer, redirect_requests
+
+CHANNEL = "CCHAT"
+BOT_ID = "B1"
+BOT_USER_ID = "UBOT"
+
+
+class Context(dict):
+    bot_id = BOT_ID
+    bot_user_id = BOT_USER_ID
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ai-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    stub = StubServer(ai_ms=args.ai_ms)
+    redirect_requests(stub.url)
+    os.environ.setdefault("AI_API_KEY", "stub")
+    os.environ["AI_STREAM_UPDATE_SECONDS"] = "0.05"
+
+    from handlers import ai, message_dispatcher
+    from utils import slack_client, transcripts
+
+    client = slack_client.BotWebClient(token="xoxb-stub", base_url=f"{stub.url}/api/")
+    context = Context()
+    fetches = []
+    edits = []
+    conversations_replies = client.conversations_replies
+    chat_update = client.chat_update
+
+    def count_fetch(**kwargs):
+        fetches.append(kwargs)
+        return conversations_replies(**kwargs)
+
+    def echo_edit(**kwargs):
+        response = chat_update(**kwargs)
+        edits.append(kwargs)
+        event = {
+            "type": "message",
+            "subtype": "message_changed",
+            "channel": kwargs["channel"],
+            "message": {
+                "bot_id": BOT_ID,
+                "user": BOT_USER_ID,
+                "text": kwargs["text"],
+                "ts": kwargs["ts"],
+                "thread_ts": thread_ts,
+            },
+        }
+        ai.track_thread_messages(
+            message_dispatcher.MessageEvent(event), None, client, context
+        )
+        return response
+
+    client.conversations_replies = count_fetch
+    client.chat_update = echo_edit
+
+    thread_ts = "1700000000.000100"
+    root = {
+        "user": "U1",
+        "text": "<@UBOT> what is a dragon?",
+        "ts": thread_ts,
+        "channel": CHANNEL,
+    }
+    turns = transcripts.cache().get(client, CHANNEL, thread_ts, current=root)
+    reply = ai._stream_answer(
+        client,
+        CHANNEL,
+        ai._build_thread_messages(turns),
+        "mention",
+        thread_ts=thread_ts,
+    )
+    transcripts.cache().add(CHANNEL, reply.message, replace=True)
+
+    followup = {
+        "user": "U1",
+        "text": "and where do they live?",
+        # The stub stamps messages with the current time.
+        "ts": f"{time.time() + 1:.6f}",
+        "thread_ts": thread_ts,
+        "channel": CHANNEL,
+    }
+    turns = transcripts.cache().get(client, CHANNEL, thread_ts, current=followup)
+    stub.close()
+
+    print(f"{len(edits)} streamed edits, {len(fetches)} conversations.replies fetches")
+    print([turn["role"] for turn in turns])
+    assert len(edits) > 1, "the reply was not streamed"
+    assert not fetches, "the transcript was dropped and refetched"
+    assert turns[1] == {"role": "assistant", "content": reply.message["text"]}, turns[1]
+    print("transcript stayed cached")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""Stand-ins for Slack, the AI proxy, the fun APIs and Postgres, with injectable latency.
+
+`StubServer` serves the Slack Web API under `/api/`, `response_url` posts under
+`/respond` and any other HTTP API under `/ext/<host>/<path>` once
+`redirect_requests` points `requests` at it. `fake_connect` replaces
+`utils.db.connect` with connections that sleep instead of querying.
+"""
+
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from utils import db, metrics
+
+# Streamed AI replies are longer than the canned JSON one, so several updates show.
+STREAMED_REPLY = (
+    "## Dragons\n\nDragons are **large** mythical reptiles found in the folklore of "
+    "many cultures. See [the article](https://example.com/dragons) for more.\n"
+) * 3
+
+PIXEL = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+
+
+def slack_payload(base_url: str, method: str, params: dict) -> dict:
+    """A successful Web API response shaped like Slack's for ``method``."""
+    channel = params.get("channel", "C0")
+    if method in ("chat.postMessage", "chat.update", "chat.postEphemeral"):
+        ts = f"{time.time():.6f}"
+        return {
+            "ok": True,
+            "channel": channel,
+            "ts": ts,
+            "message_ts": ts,
+            "message": {
+                "text": params.get("text", ""),
+                "ts": ts,
+                "bot_id": "B1",
+                "thread_ts": params.get("thread_ts"),
+            },
+        }
+    if method == "conversations.replies":
+        return {
+            "ok": True,
+            "has_more": False,
+            "messages": [
+                {"user": "U1", "text": "what is a dragon?", "ts": "1700000000.000100"},
+                {
+                    "bot_id": "B1",
+                    "text": "A large mythical reptile.",
+                    "ts": "1700000001.000100",
+                },
+            ],
+        }
+    if method == "usergroups.users.list":
+        return {"ok": True, "users": ["U1", "U2"]}
+    if method == "auth.test":
+        return {"ok": True, "user_id": "UBOT", "bot_id": "B1", "team_id": "T0"}
+    if method == "users.info":
+        return {
+            "ok": True,
+            "user": {
+                "id": params.get("user", "U1"),
+                "name": "replay",
+                "real_name": "Replay User",
+            },
+        }
+    if method == "files.getUploadURLExternal":
+        return {"ok": True, "upload_url": f"{base_url}/upload", "file_id": "F1"}
+    if method == "files.completeUploadExternal":
+        return {"ok": True, "files": [{"id": "F1", "title": "upload"}]}
+    if method in ("views.open", "views.update", "views.publish"):
+        return {"ok": True, "view": {"id": "V1"}}
+    return {"ok": True}
+
+
+def ai_stream_events(content: str = STREAMED_REPLY) -> list[bytes]:
+    """``content`` as the server-sent events of a streamed chat completion, a word at a time."""
+    events = [
+        b"data: "
+        + json.dumps({"choices": [{"delta": {"content": word}}]}).encode()
+        + b"\n\n"
+        for word in re.findall(r"\S+\s*", content)
+    ]
+    return events + [b"data: [DONE]\n\n"]
+
+
+def external_payload(host: str) -> object:
+    """A response shaped like the real API on ``host`` (AI proxy, search, fun APIs)."""
+    if host.startswith("ai."):
+        return {
+            "choices": [
+                {
+                    "message": {
+                        "role": "assistant",
+                        "content": "Dragons are *large* mythical reptiles.",
+                        "images": [{"image_url": {"url": PIXEL}}],
+                    }
+                }
+            ]
+        }
+    if host.startswith("search."):
+        return {
+            "web": {
+                "results": [
+                    {
+                        "title": "Dragon",
+                        "url": "https://example.com",
+                        "description": "A reptile.",
+                    }
+                ]
+            }
+        }
+    if host == "zenquotes.io":
+        return [{"q": "Stay hungry.", "a": "Someone"}]
+    if host == "icanhazdadjoke.com":
+        return {"id": "R7UfaahVfFd", "joke": "I'm reading a book about anti-gravity."}
+    if host == "dog.ceo":
+        return {
+            "message": "https://images.dog.ceo/breeds/hound/1.jpg",
+            "status": "success",
+        }
+    if host == "api.thecatapi.com":
+        return [{"url": "https://cdn2.thecatapi.com/images/1.jpg"}]
+    if host == "xkcd.com":
+        return {
+            "num": 327,
+            "title": "Exploits of a Mom",
+            "safe_title": "Exploits of a Mom",
+            "alt": "Her daughter is named Help I'm trapped in a driver's license factory.",
+            "img": "https://imgs.xkcd.com/comics/exploits_of_a_mom.png",
+            "year": "2007",
+            "month": "10",
+            "day": "10",
+        }
+    return {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle and delayed ACKs
+    # add ~40 ms to every call on a kept-alive connection.
+    disable_nagle_algorithm = True
+
+    def _params(self) -> dict:
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(raw or b"{}")
+        return {k: v[0] for k, v in parse_qs(raw.decode(errors="replace")).items()}
+
+    def _send(self, payload):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_events(self, events: list[bytes], seconds: float):
+        """Stream ``events`` over ``seconds`` with chunked encoding."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in events:
+            time.sleep(seconds / len(events))
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _handle(self):
+        server = self.server.stub
+        path = urlsplit(self.path).path
+        params = self._params()
+        next(server.requests)
+        if path.startswith("/api/"):
+            time.sleep(server.slack_ms / 1000)
+            self._send(slack_payload(server.url, path[len("/api/") :], params))
+        elif path in ("/respond", "/upload"):
+            time.sleep(server.slack_ms / 1000)
+            self._send(b"ok")
+        elif path.startswith("/ext/"):
+            host = path[len("/ext/") :].partition("/")[0]
+            latency = server.ai_ms if host.startswith("ai.") else server.http_ms
+            if host.startswith("ai.") and params.get("stream"):
+                self._send_events(ai_stream_events(), latency / 1000)
+                return
+            time.sleep(latency / 1000)
+            self._send(external_payload(host))
+        else:
+            self.send_error(404)
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Streamed AI replies hold connections open; keep bursts from being reset.
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        pass  # clients that hang up early are expected under load
+
+
+class StubServer:
+    """Threaded HTTP server for every outbound call the bot makes."""
+
+    def __init__(self, slack_ms: float = 0, ai_ms: float = 0, http_ms: float = 0):
+        self.slack_ms = slack_ms
+        self.ai_ms = ai_ms
+        self.http_ms = http_ms
+        self.requests = itertools.count()
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.stub = self
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+
+
+def redirect_requests(base_url: str):
+    """Send every ``requests`` call not already aimed at ``base_url`` to ``/ext/<host>``."""
+    import requests
+
+    original = requests.Session.request
+
+    def request(self, method, url, *args, **kwargs):
+        parts = urlsplit(url)
+        if not url.startswith(base_url):
+            url = f"{base_url}/ext/{parts.netloc}{parts.path}"
+            if parts.query:
+                url += f"?{parts.query}"
+        return original(self, method, url, *args, **kwargs)
+
+    requests.Session.request = request
+
+
+class FakeCursor:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, vars=None):
+        with metrics.track("db", db.query_name(query)):
+            time.sleep(self.latency)
+
+    def executemany(self, query, vars_list):
+        self.execute(query)
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self.latency)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def fake_connect(db_ms: float):
+    """Drop-in for ``utils.db.connect`` whose statements each take ``db_ms``."""
+    return lambda dsn=None: FakeConnection(db_ms / 1000)
@@ -0,0 +1,88 @@
+"""Show how throughput of CPU-heavy message handling scales with worker processes.
+
+Feeds the same envelopes through `utils.workers` with 1..N forked workers. Each
+envelope is JSON-decoded, classified, run through the `fun` trigger-word regex
+and `_md_to_slack_mrkdwn`, the regex-heavy paths that the GIL serialises in a
+single process.
+
+    uv run python -m benchmarks.worker_scaling --events 20000 --max-workers 8
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from handlers import fun, message_dispatcher
+from handlers.ai import _md_to_slack_mrkdwn
+from utils import workers
+
+MARKDOWN = (
+    "## Answer\n\nHere is **bold** and __also bold__ text with a [link](https://example.com) "
+    "and an ![image](https://example.com/a.png).\n\n---\n\n" * 4
+)
+
+
+def make_envelopes(count: int, channels: int = 64) -> list[str]:
+    rng = random.Random(7)
+    return [
+        json.dumps(
+            {
+                "type": "event_callback",
+                "event": {
+                    "type": "message",
+                    "channel": f"C{rng.randrange(channels)}",
+                    "user": f"U{rng.randrange(1000)}",
+                    "text": "the dragon reviewed https://hackclub.slack.com/archives/C1 in python "
+                    + MARKDOWN,
+                    "ts": f"{1700000000 + i}.000100",
+                },
+            }
+        )
+        for i in range(count)
+    ]
+
+
+def handle(raw: str):
+    payload = json.loads(raw)
+    message = message_dispatcher.MessageEvent(payload["event"])
+    text = message.lower_text
+    for word in fun.TRIGGER_WORDS:
+        if word in text:
+            fun.HACKCLUB_SLACK_URL_PATTERN.sub("", text)
+    _md_to_slack_mrkdwn(message.text)
+
+
+def run(envelopes: list[str], count: int) -> float:
+    queues, processes = workers.start_workers(count, lambda: handle)
+    started = time.perf_counter()
+    for raw in envelopes:
+        event = json.loads(raw)
+        queues[workers.shard_for(event, count)].put(raw)
+    for queue in queues:
+        queue.put(None)
+    for process in processes:
+        process.join()
+    return len(envelopes) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    os.environ["METRICS_PORT"] = "0"
+    envelopes = make_envelopes(args.events)
+    counts = sorted({1, *range(2, args.max_workers + 1, 2), args.max_workers})
+    baseline = None
+    print(f"{'workers':>7} {'events/s':>10} {'speed-up':>9}")
+    for count in counts:
+        throughput = run(envelopes, count)
+        baseline = baseline or throughput
+        print(f"{count:>7} {throughput:>10.0f} {throughput / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
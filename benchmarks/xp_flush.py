@@ -0,0 +1,104 @@
+"""Compare messages/sec of per-message XP writes against the write-behind accumulator.
+
+Awards XP for the same stream of messages twice against the Postgres at
+``DATABASE_URL``: once the previous way (connect, SELECT, UPSERT and commit per
+message) and once through ``leveling.XPAccumulator``, including its final flush.
+Rows are written under ``BENCH`` user ids and deleted afterwards.
+
+    DATABASE_URL=postgresql://... uv run python -m benchmarks.xp_flush --messages 5000
+"""
+
+import argparse
+import os
+import random
+import time
+
+from handlers import leveling
+from utils import db, migrations
+
+PREFIX = "BENCH"
+
+
+def make_users(count: int, users: int) -> list[str]:
+    rng = random.Random(3)
+    return [f"{PREFIX}{rng.randrange(users)}" for _ in range(count)]
+
+
+def legacy_award(user_id: str) -> tuple[int, int]:
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT xp FROM user_xp WHERE user_id = %s", (user_id,))
+            row = cur.fetchone()
+            old_xp = row[0] if row else 0
+            new_xp = old_xp + leveling.XP_PER_MESSAGE
+            cur.execute(
+                """INSERT INTO user_xp (user_id, xp) VALUES (%s, %s)
+                   ON CONFLICT (user_id) DO UPDATE SET xp = %s""",
+                (user_id, new_xp, new_xp),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return old_xp, new_xp
+
+
+def clean():
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM user_xp WHERE user_id LIKE %s", (PREFIX + "%",))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def totals() -> dict[str, int]:
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT user_id, xp FROM user_xp WHERE user_id LIKE %s", (PREFIX + "%",)
+            )
+            return dict(cur.fetchall())
+    finally:
+        conn.close()
+
+
+def run(name: str, award, stream: list[str], finish=None) -> dict[str, int]:
+    clean()
+    started = time.perf_counter()
+    for user_id in stream:
+        award(user_id)
+    if finish:
+        finish()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<12} {len(stream) / elapsed:>10.0f} msg/s  ({elapsed:.2f}s)")
+    return totals()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=leveling.FLUSH_BATCH)
+    args = parser.parse_args()
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL must point at a Postgres database")
+
+    migrations.migrate()
+    stream = make_users(args.messages, args.users)
+    before = run("per-message", legacy_award, stream)
+    accumulator = leveling.XPAccumulator(interval=5, batch=args.batch)
+    after = run(
+        "write-behind",
+        lambda u: accumulator.add(u, leveling.XP_PER_MESSAGE),
+        stream,
+        accumulator.flush,
+    )
+    clean()
+    print("totals match" if before == after else "TOTALS DIFFER")
+
+
+if __name__ == "__main__":
+    main()
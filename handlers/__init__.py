@@ -1 +1,36 @@
+import logging
 
+
+def register_handlers(app):
+    from handlers import (
+        ai,
+        fun,
+        help,
+        join_manager,
+        leveling,
+        message_dispatcher,
+        miscellaneous,
+        welcome,
+        xkcd,
+    )
+
+    logging.info("Registering handlers...")
+    ai.register(app)
+    logging.debug("Registered ai handlers")
+    fun.register(app)
+    logging.debug("Registered fun handlers")
+    help.register(app)
+    logging.debug("Registered help handlers")
+    join_manager.register(app)
+    logging.debug("Registered join_manager handlers")
+    leveling.register(app)
+    logging.debug("Registered leveling handlers")
+    miscellaneous.register(app)
+    logging.debug("Registered miscellaneous handlers")
+    welcome.register(app)
+    logging.debug("Registered welcome handlers")
+    xkcd.register(app)
+    logging.debug("Registered xkcd handlers")
+    message_dispatcher.register(app)
+    logging.debug("Registered message dispatcher")
+    logging.info("All handlers registered successfully")
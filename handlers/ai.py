@@ -3,24 +3,54 @@ import json
 import logging
 import os
 import re
+import time
+from concurrent.futures import wait
 from datetime import datetime
 from typing import Dict, List
 
-import psycopg2
-import requests
-from dotenv import load_dotenv
-from slack_bolt import Assistant, Say, SetStatus
+from slack_bolt import Say, SetStatus
 from slack_bolt.context.set_suggested_prompts import SetSuggestedPrompts
 
-load_dotenv()
+from handlers import message_dispatcher
+from utils import (
+    db,
+    executors,
+    http_client,
+    metrics,
+    response_cache,
+    runtime,
+    streaming,
+    thread_index,
+    transcripts,
+)
+from utils.cache import TTLCache
 
 AI_API_KEY = os.getenv("AI_API_KEY")
 SEARCH_API_KEY = os.getenv("SEARCH_API_KEY")
 DATABASE_URL = os.getenv("DATABASE_URL")
 CHAT_CHANNEL = os.getenv("CHAT_CHANNEL")
 OWNER_USER_ID = os.getenv("OWNER_USER_ID")
-URL = "https://ai.hackclub.com/proxy/v1/chat/completions"
+URL = os.getenv("AI_API_URL", "https://ai.hackclub.com/proxy/v1/chat/completions")
+CHAT_MODEL = "google/gemini-2.5-flash"
 DAILY_LIMIT = 20
+# Mentions and follow-ups answer a whole thread, often with web search, so they
+# rarely repeat and go stale; their replies are cached only when this is set.
+CACHE_THREADS = os.getenv("AI_CACHE_THREADS", "0") != "0"
+# Image generation answers in one piece, well after the default read timeout.
+IMAGE_READ_TIMEOUT = 120
+# Rounds of tool calls one answer may make, and the seconds they may take in all;
+# after either runs out the model has to answer with what it has.
+TOOL_ROUNDS = int(os.getenv("AI_TOOL_ROUNDS", "3"))
+TOOL_DEADLINE = float(os.getenv("AI_TOOL_DEADLINE", "45"))
+NO_RESULTS = "No results found."
+# "No results" answers are kept for less time: the index may catch up with new events.
+SEARCH_NEGATIVE_TTL = float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "60"))
+
+_searches = TTLCache(
+    "web_search",
+    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", "600")),
+)
 
 CHAT_SYSTEM_PROMPT = (
     "You are Dragon Bot, a helpful and friendly Slack bot for the Hack Club community. "
@@ -52,10 +82,19 @@ SEARCH_TOOL = {
 
 
 def do_web_search(query):
-    """Search using Hack Club Search API."""
+    """Search using Hack Club Search API.
+
+    Formatted results are cached by query, ignoring case and spacing.
+    """
+    key = " ".join(query.casefold().split())
+    cached = _searches.get(key)
+    if cached is not None:
+        return cached
+
     headers = {"Authorization": f"Bearer {SEARCH_API_KEY}"}
-    resp = requests.get(
+    resp = http_client.client().get(
         "https://search.hackclub.com/res/v1/web/search",
+        "search",
         params={"q": query, "count": 5},
         headers=headers,
     )
@@ -69,57 +108,130 @@ def do_web_search(query):
             f"URL: {r.get('url', '')}\n"
             f"Snippet: {r.get('description', '')}"
         )
-    return "\n\n".join(formatted) if formatted else "No results found."
+    if not formatted:
+        _searches.set(key, NO_RESULTS, ttl=SEARCH_NEGATIVE_TTL)
+        return NO_RESULTS
+    text = "\n\n".join(formatted)
+    _searches.set(key, text)
+    return text
+
 
+def _complete(payload: dict, on_delta=None) -> dict:
+    """Send a chat completion and return the reply message.
 
-def call_ai_with_search(messages: List[Dict[str, str]]) -> str:
-    """Call the AI API with optional search tool support. Returns the response text."""
+    With ``on_delta`` the reply is streamed and each piece of content is passed
+    to it as it arrives; tool calls are reassembled from their deltas. A proxy
+    that answers a streamed request with plain JSON is handled too.
+    """
     headers = {
         "Authorization": f"Bearer {AI_API_KEY}",
         "Content-Type": "application/json",
     }
+    stream = on_delta is not None
+    with http_client.client().stream(
+        "POST", URL, "ai_proxy", headers=headers, json=dict(payload, stream=stream)
+    ) as response:
+        response.raise_for_status()
+        if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+            message = response.json().get("choices", [{}])[0].get("message", {})
+            if stream and message.get("content"):
+                on_delta(message["content"])
+            return message
+
+        content = []
+        tool_calls = {}
+        for chunk in streaming.iter_sse(response):
+            delta = (chunk.get("choices") or [{}])[0].get("delta") or {}
+            if delta.get("content"):
+                content.append(delta["content"])
+                on_delta(delta["content"])
+            for call in delta.get("tool_calls") or []:
+                slot = tool_calls.setdefault(
+                    call.get("index", 0),
+                    {"id": "", "type": "function", "function": {"name": "", "arguments": ""}},
+                )
+                slot["id"] = call.get("id") or slot["id"]
+                function = call.get("function") or {}
+                slot["function"]["name"] += function.get("name") or ""
+                slot["function"]["arguments"] += function.get("arguments") or ""
+
+    message = {"role": "assistant", "content": "".join(content)}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+    return message
+
+
+def _run_tool(call: dict) -> str:
+    """Run one tool call and return its result for the model; failures are reported to it."""
+    name = call["function"]["name"]
+    if name != "web_search":
+        return f"Error: unknown tool {name!r}."
+    try:
+        with metrics.track("tool", name):
+            args = json.loads(call["function"]["arguments"] or "{}")
+            query = args.get("query", "")
+            logging.info(f"AI requested web search: {query}")
+            return do_web_search(query)
+    except Exception as e:
+        logging.error(f"Error in {name} tool call: {e}")
+        return f"Error: {name} failed: {e}"
 
+
+def _run_tools(calls: list, deadline: float) -> list[str]:
+    """Run a round of tool calls concurrently, giving up on any still going at ``deadline``."""
+    futures = []
+    for call in calls:
+        try:
+            futures.append(executors.pool("tools").submit(_run_tool, call))
+        except executors.Busy:
+            futures.append(None)
+    # Calls the pool had no room for run here, while the others run on it.
+    results = [_run_tool(call) if f is None else None for call, f in zip(calls, futures)]
+    wait([f for f in futures if f is not None], timeout=max(0, deadline - time.monotonic()))
+    for i, future in enumerate(futures):
+        if future is None:
+            continue
+        if future.done():
+            results[i] = future.result()
+        else:
+            metrics.inc("ai_tool_timeouts_total", tool=calls[i]["function"]["name"])
+            results[i] = "Error: the tool call timed out."
+    return results
+
+
+def call_ai_with_search(messages: List[Dict[str, str]], on_delta=None) -> str:
+    """Call the AI API with optional search tool support. Returns the response text.
+
+    Each round's tool calls run concurrently and all their results go back to the
+    model, for up to ``TOOL_ROUNDS`` rounds within ``TOOL_DEADLINE`` seconds; the
+    last completion is offered no tools. ``on_delta`` streams the reply as in
+    ``_complete``.
+    """
     payload = {
-        "model": "google/gemini-2.5-flash",
+        "model": CHAT_MODEL,
         "messages": messages,
-        "stream": False,
     }
     if SEARCH_API_KEY:
         payload["tools"] = [SEARCH_TOOL]
 
-    response = requests.post(URL, headers=headers, json=payload)
-    response.raise_for_status()
-    result = response.json()
-
-    choice = result.get("choices", [{}])[0]
-    message = choice.get("message", {})
-
-    if message.get("tool_calls"):
-        tool_call = message["tool_calls"][0]
-        if tool_call["function"]["name"] == "web_search":
-            args = json.loads(tool_call["function"]["arguments"])
-            search_query = args.get("query", "")
-            logging.info(f"AI requested web search: {search_query}")
-
-            search_results = do_web_search(search_query)
-
-            messages.append(message)
-            messages.append(
-                {
-                    "role": "tool",
-                    "tool_call_id": tool_call["id"],
-                    "content": search_results,
-                }
-            )
-
-            payload["messages"] = messages
+    deadline = time.monotonic() + TOOL_DEADLINE
+    message = _complete(payload, on_delta)
+
+    for turn in range(TOOL_ROUNDS):
+        calls = message.get("tool_calls")
+        if not calls or "tools" not in payload:
+            break
+        logging.info(f"AI tool round {turn + 1}: {len(calls)} call(s)")
+        results = _run_tools(calls, deadline)
+        messages.append(message)
+        messages.extend(
+            {"role": "tool", "tool_call_id": call["id"], "content": result}
+            for call, result in zip(calls, results)
+        )
+        payload["messages"] = messages
+        if turn == TOOL_ROUNDS - 1 or time.monotonic() >= deadline:
             payload.pop("tools", None)
-
-            response = requests.post(URL, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            choice = result.get("choices", [{}])[0]
-            message = choice.get("message", {})
+        message = _complete(payload, on_delta)
 
     return message.get("content", "")
 
@@ -140,6 +252,138 @@ def _md_to_slack_mrkdwn(text: str) -> str:
     return text
 
 
+# An image or link whose closing ``)`` has not arrived yet.
+_OPEN_LINK = re.compile(r"!?\[[^\]\n]*(?:\](?:\([^)\n]*)?)?$")
+# A header line whose text has not arrived yet.
+_HEADER_MARK = re.compile(r"#{1,6}\s*")
+
+
+class MrkdwnStream:
+    """Converts Markdown to Slack mrkdwn as it streams in.
+
+    Finished lines are converted once and kept. The line still arriving is
+    converted each time ``text`` is called, cut before an unfinished link, an
+    unpaired ``**``/``__`` or a bare ``#`` so half-received markup never shows.
+    The whole reply should still go through ``_md_to_slack_mrkdwn`` once complete,
+    for markup that spans lines.
+    """
+
+    def __init__(self):
+        self._done = ""
+        self._line = ""
+
+    def feed(self, piece: str):
+        *finished, self._line = (self._line + piece).split("\n")
+        for line in finished:
+            self._done += _md_to_slack_mrkdwn(line) + "\n"
+
+    def text(self) -> str:
+        line = self._line
+        match = _OPEN_LINK.search(line)
+        if match:
+            line = line[: match.start()]
+        # A lone trailing ``*`` or ``_`` may be half of a ``**`` or ``__``.
+        line = line.rstrip("*_")
+        if _HEADER_MARK.fullmatch(line):
+            line = ""
+        for marker in ("**", "__"):
+            if line.count(marker) % 2:
+                line = line[: line.rfind(marker)]
+        return self._done + _md_to_slack_mrkdwn(line)
+
+
+def _stream_answer(
+    client,
+    channel: str,
+    messages: list,
+    name: str,
+    thread_ts: str | None = None,
+    search: bool = True,
+    empty: str = "I couldn't come up with a response.",
+    failed: str = ":x: Something went wrong: {}",
+    cache_key: str | None = None,
+    user_id: str | None = None,
+) -> streaming.StreamingReply | None:
+    """Post a placeholder and stream the AI's reply into it.
+
+    ``search`` offers the web search tool. ``name`` labels the reply's metrics.
+    A complete reply is stored in the response cache under ``cache_key``. If
+    Slack refuses the reply, ``user_id``'s use is refunded, the placeholder is
+    removed and None is returned.
+    """
+    reply = streaming.StreamingReply(client, channel, thread_ts=thread_ts, name=name)
+    try:
+        reply.start()
+    except Exception as e:
+        logging.error(f"Could not post the AI reply for {name}: {e}")
+        refund_usage(user_id)
+        return None
+    text = MrkdwnStream()
+
+    def on_delta(piece):
+        text.feed(piece)
+        if reply.due():
+            reply.update(text.text())
+
+    try:
+        if search:
+            content = call_ai_with_search(messages, on_delta)
+        else:
+            content = _complete({"model": CHAT_MODEL, "messages": messages}, on_delta)
+            content = content.get("content", "")
+    except Exception as e:
+        logging.error(f"Error in AI reply for {name}: {e}")
+        return _finish(reply, failed.format(e), user_id)
+
+    if not content:
+        logging.warning(f"AI returned empty response for {name}")
+        return _finish(reply, empty, user_id)
+    logging.info(f"AI response streamed for {name}, length: {len(content)} chars")
+    reply = _finish(reply, _md_to_slack_mrkdwn(content), user_id)
+    if reply is not None and cache_key:
+        response_cache.cache().set(cache_key, reply.message["text"])
+    return reply
+
+
+def _finish(reply, text: str, user_id: str | None) -> streaming.StreamingReply | None:
+    """Write ``text`` as the final reply; if Slack refuses, undo the placeholder and the use."""
+    try:
+        reply.finish(text)
+        return reply
+    except Exception as e:
+        logging.error(f"Could not finish the AI reply for {reply.name}: {e}")
+    refund_usage(user_id)
+    try:
+        reply.client.chat_delete(channel=reply.channel, ts=reply.ts)
+    except Exception as e:
+        logging.error(f"Could not delete the AI reply placeholder: {e}")
+    # The placeholder was added to the thread's transcript when it was posted.
+    transcripts.cache().invalidate(reply.channel, reply.thread_ts or reply.ts)
+    return None
+
+
+def _post_cached(
+    client, channel: str, cache_key: str | None, name: str, thread_ts: str | None = None
+) -> bool:
+    """Post the cached reply for ``cache_key``, if there is one. Hits use no quota."""
+    if not cache_key:
+        return False
+    text = response_cache.cache().get(cache_key)
+    if text is None:
+        return False
+    logging.info(f"AI response for {name} served from cache")
+    client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=text)
+    return True
+
+
+def _thread_cache_key(messages: list) -> str | None:
+    """Cache key for a thread's whole conversation when ``AI_CACHE_THREADS`` is on."""
+    if not CACHE_THREADS:
+        return None
+    conversation = "\n".join(f"{m['role']}: {m['content']}" for m in messages[1:])
+    return response_cache.key(CHAT_MODEL, messages[0]["content"], conversation)
+
+
 PERSONALITY = [
     "discord zoomer",
     "potter head",
@@ -148,28 +392,6 @@ PERSONALITY = [
 ]
 
 
-def _init_db():
-    """Create the ai_usage table if it doesn't exist."""
-    if not DATABASE_URL:
-        return
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS ai_usage (
-                        usage_date DATE PRIMARY KEY,
-                        count INTEGER NOT NULL DEFAULT 0
-                    )
-                """)
-            conn.commit()
-        finally:
-            conn.close()
-        logging.info("Database initialized successfully")
-    except Exception as e:
-        logging.error(f"Failed to initialize database: {e}")
-
-
 def check_and_increment_usage(user_id: str | None = None) -> bool:
     """Check and increment the daily AI usage count using PostgreSQL."""
     if user_id and user_id == OWNER_USER_ID:
@@ -182,8 +404,7 @@ def check_and_increment_usage(user_id: str | None = None) -> bool:
     today = datetime.now().date()
 
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        try:
+        with db.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT count FROM ai_usage WHERE usage_date = %s",
@@ -203,96 +424,120 @@ def check_and_increment_usage(user_id: str | None = None) -> bool:
                 conn.commit()
                 logging.debug(f"Usage incremented for {today}")
                 return True
-        finally:
-            conn.close()
     except Exception as e:
         logging.error(f"Database error in usage tracking: {e}")
         return True
 
 
-def _build_thread_messages(replies):
-    """Build AI message list from thread replies."""
-    messages = [
-        {"role": "system", "content": CHAT_SYSTEM_PROMPT},
-    ]
-    for msg in replies["messages"]:
-        role = "user" if msg.get("bot_id") is None else "assistant"
-        msg_text = msg.get("text", "")
-        if role == "user":
-            msg_text = re.sub(r"<@[A-Z0-9]+>", "", msg_text).strip()
-        if msg_text:
-            messages.append({"role": role, "content": msg_text})
-    return messages
-
-
-def handle_thread_followup(event, say, client, context):
-    """Respond to thread replies where the bot has already participated."""
-    thread_ts = event.get("thread_ts")
-    if not thread_ts:
-        return
-
-    if event.get("bot_id") or event.get("subtype"):
-        return
-
-    channel_type = event.get("channel_type", "")
-    if channel_type in ("im", "mpim"):
+def refund_usage(user_id: str | None = None):
+    """Give back a use counted by ``check_and_increment_usage`` for a reply never delivered."""
+    if (user_id and user_id == OWNER_USER_ID) or not DATABASE_URL:
         return
+    try:
+        with db.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """UPDATE ai_usage SET count = count - 1
+                       WHERE usage_date = %s AND count > 0""",
+                    (datetime.now().date(),),
+                )
+            conn.commit()
+    except Exception as e:
+        logging.error(f"Database error refunding AI usage: {e}")
+
+
+def _build_thread_messages(turns):
+    """Build AI message list from a thread's cached transcript."""
+    return [{"role": "system", "content": CHAT_SYSTEM_PROMPT}, *turns]
+
+
+def track_thread_messages(message, say, client, context):
+    """Keep cached thread transcripts in step with the chat channel."""
+    event = message.event
+    if message.kind in ("plain", "content"):
+        if message.thread_ts:
+            transcripts.cache().add(message.channel, event)
+    elif message.kind == "edit":
+        edited = event.get("message", {})
+        own = {getattr(context, "bot_id", None), getattr(context, "bot_user_id", None)}
+        if {edited.get("bot_id"), edited.get("user")} & (own - {None}):
+            # Streamed replies are edited many times; their final text is written
+            # to the transcript when the reply finishes.
+            return
+        thread_ts = edited.get("thread_ts") or edited.get("ts")
+        transcripts.cache().add(message.channel, dict(edited, thread_ts=thread_ts), replace=True)
+    elif message.kind == "delete":
+        previous = event.get("previous_message", {})
+        transcripts.cache().invalidate(
+            message.channel, previous.get("thread_ts") or event.get("deleted_ts")
+        )
 
-    channel = event.get("channel")
-    if CHAT_CHANNEL and channel != CHAT_CHANNEL:
-        return
 
-    text = event.get("text", "")
+def handle_thread_followup(message, say, client, context):
+    """Respond to thread replies where the bot has already participated."""
+    thread_ts = message.thread_ts
+    channel = message.channel
+    text = message.text
     bot_user_id = getattr(context, "bot_user_id", None)
     if bot_user_id and f"<@{bot_user_id}>" in text:
         return
 
+    if (channel, thread_ts) not in thread_index.index():
+        return
+
     try:
-        replies = client.conversations_replies(
-            channel=channel,
-            ts=thread_ts,
-            limit=20,
-        )
+        turns = transcripts.cache().get(client, channel, thread_ts, current=message.event)
     except Exception:
         return
 
-    bot_participated = any(
-        msg.get("bot_id") for msg in replies.get("messages", [])
-    )
-    if not bot_participated:
-        return
+    user_id = message.user_id
 
-    if not AI_API_KEY:
+    user_message = re.sub(r"<@[A-Z0-9]+>", "", text).strip()
+    if not user_message:
         return
 
-    user_id = event.get("user")
+    messages = _build_thread_messages(turns)
+    cache_key = _thread_cache_key(messages)
+    if _post_cached(client, channel, cache_key, "followup", thread_ts):
+        return
 
     if not check_and_increment_usage(user_id):
         return
-    user_message = re.sub(r"<@[A-Z0-9]+>", "", text).strip()
-    if not user_message:
-        return
-
-    logging.info(f"Thread follow-up from <@{user_id}>: {user_message[:50]}...")
 
-    messages = _build_thread_messages(replies)
+    logging.info("Thread follow-up from <@%s>: %.50s...", user_id, user_message)
 
-    try:
-        content = call_ai_with_search(messages)
-        if content:
-            content = _md_to_slack_mrkdwn(content)
-            say(text=content, thread_ts=thread_ts)
-        else:
-            say(text="I couldn't come up with a response.", thread_ts=thread_ts)
-    except Exception as e:
-        logging.error(f"Error in thread follow-up: {e}")
-        say(text=f":x: Something went wrong: {e}", thread_ts=thread_ts)
+    reply = _stream_answer(
+        client,
+        channel,
+        messages,
+        "followup",
+        thread_ts=thread_ts,
+        cache_key=cache_key,
+        user_id=user_id,
+    )
+    if reply is not None:
+        transcripts.cache().add(channel, reply.message, replace=True)
 
 
 def register(app):
-    _init_db()
+    if AI_API_KEY:
+        message_dispatcher.subscribe(
+            "ai",
+            handle_thread_followup,
+            slow_after=120,
+            workload="ai",
+            threads=True,
+            channels=("chat",),
+        )
+        message_dispatcher.subscribe(
+            "transcripts",
+            track_thread_messages,
+            bots=True,
+            kinds=("plain", "content", "edit", "delete"),
+            channels=("chat",),
+        )
 
-    @app.command("/generate-image")
+    @app.command("/generate-image", workload="ai")
     def generate_image(ack, command):
         ack()
         logging.info(f"/generate-image used by <@{command['user_id']}>")
@@ -348,7 +593,9 @@ def register(app):
 
         try:
             logging.debug(f"Sending image generation request to {URL}")
-            response = requests.post(URL, headers=headers, json=payload)
+            response = http_client.client().post(
+                URL, "ai_proxy", headers=headers, json=payload, read_timeout=IMAGE_READ_TIMEOUT
+            )
             logging.debug(f"API response status: {response.status_code}")
             result = response.json()
 
@@ -385,7 +632,7 @@ def register(app):
                 text=f"Failed to generate image: {e}",
             )
 
-    @app.command("/ask-ai")
+    @app.command("/ask-ai", workload="ai")
     def ask_ai(ack, command):
         ack()
         logging.info(f"/ask-ai used by <@{command['user_id']}>")
@@ -405,62 +652,43 @@ def register(app):
             )
             return
 
-        if not check_and_increment_usage(command["user_id"]):
+        prompt = command.get("text", "").strip()
+        if not prompt:
+            logging.debug("No prompt provided for /ask-ai")
             app.client.chat_postMessage(
                 channel=command["channel_id"],
-                text=f":x: The daily AI command limit of {DAILY_LIMIT} has been reached.",
+                text="Please provide a prompt. Usage: `/ask-ai <prompt>`",
             )
             return
 
-        prompt = command.get("text", "").strip()
-        if not prompt:
-            logging.debug("No prompt provided for /ask-ai")
+        cache_key = response_cache.key(CHAT_MODEL, CHAT_SYSTEM_PROMPT, prompt)
+        if _post_cached(app.client, command["channel_id"], cache_key, "/ask-ai"):
+            return
+
+        if not check_and_increment_usage(command["user_id"]):
             app.client.chat_postMessage(
                 channel=command["channel_id"],
-                text="Please provide a prompt. Usage: `/ask-ai <prompt>`",
+                text=f":x: The daily AI command limit of {DAILY_LIMIT} has been reached.",
             )
             return
 
         logging.info(f"Asking AI with prompt: {prompt[:50]}...")
-        headers = {
-            "Authorization": f"Bearer {AI_API_KEY}",
-            "Content-Type": "application/json",
-        }
-
-        payload = {
-            "model": "google/gemini-2.5-flash",
-            "messages": [
+        _stream_answer(
+            app.client,
+            command["channel_id"],
+            [
                 {"role": "system", "content": CHAT_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt},
             ],
-            "stream": False,
-        }
-
-        try:
-            logging.debug(f"Sending AI request to {URL}")
-            response = requests.post(URL, headers=headers, json=payload)
-            response.raise_for_status()
-            logging.debug(f"API response status: {response.status_code}")
-            result = response.json()
-
-            if result.get("choices") and result["choices"][0]["message"].get("content"):
-                content = _md_to_slack_mrkdwn(result["choices"][0]["message"]["content"])
-                logging.info(f"AI response received, length: {len(content)} chars")
-                app.client.chat_postMessage(channel=command["channel_id"], text=content)
-            else:
-                logging.warning("AI returned empty response")
-                app.client.chat_postMessage(
-                    channel=command["channel_id"],
-                    text="I couldn't get a response from the AI.",
-                )
-        except Exception as e:
-            logging.error(f"Error asking AI: {e}")
-            app.client.chat_postMessage(
-                channel=command["channel_id"],
-                text=f"Failed to communicate with the AI API: {e}",
-            )
+            "/ask-ai",
+            search=False,
+            empty="I couldn't get a response from the AI.",
+            failed="Failed to communicate with the AI API: {}",
+            cache_key=cache_key,
+            user_id=command["user_id"],
+        )
 
-    @app.event("app_mention")
+    @app.event("app_mention", workload="ai")
     def handle_mention(event, say, client):
         channel = event.get("channel")
         if CHAT_CHANNEL and channel != CHAT_CHANNEL:
@@ -469,6 +697,8 @@ def register(app):
         user_id = event.get("user")
         text = event.get("text", "")
         thread_ts = event.get("thread_ts") or event.get("ts")
+        # Follow-ups in this thread no longer need to mention the bot.
+        thread_index.index().add(channel, thread_ts)
 
         user_message = re.sub(r"<@[A-Z0-9]+>", "", text).strip()
         if not user_message:
@@ -479,6 +709,12 @@ def register(app):
             say(text=":x: The AI API key is not configured.", thread_ts=thread_ts)
             return
 
+        turns = transcripts.cache().get(client, channel, thread_ts, current=event)
+        messages = _build_thread_messages(turns)
+        cache_key = _thread_cache_key(messages)
+        if _post_cached(client, channel, cache_key, "mention", thread_ts):
+            return
+
         if not check_and_increment_usage(user_id):
             if not event.get("thread_ts"):
                 say(
@@ -489,26 +725,19 @@ def register(app):
 
         logging.info(f"AI mention from <@{user_id}>: {user_message[:50]}...")
 
-        replies = client.conversations_replies(
-            channel=channel,
-            ts=thread_ts,
-            limit=20,
+        reply = _stream_answer(
+            client,
+            channel,
+            messages,
+            "mention",
+            thread_ts=thread_ts,
+            cache_key=cache_key,
+            user_id=user_id,
         )
-        messages = _build_thread_messages(replies)
-
-        try:
-            content = call_ai_with_search(messages)
-            if content:
-                content = _md_to_slack_mrkdwn(content)
-                logging.info(f"AI mention response sent, length: {len(content)} chars")
-                say(text=content, thread_ts=thread_ts)
-            else:
-                say(text="I couldn't come up with a response.", thread_ts=thread_ts)
-        except Exception as e:
-            logging.error(f"Error in AI mention: {e}")
-            say(text=f":x: Something went wrong: {e}", thread_ts=thread_ts)
+        if reply is not None:
+            transcripts.cache().add(channel, reply.message, replace=True)
 
-    assistant = Assistant()
+    assistant = runtime.new_assistant(app)
 
     @assistant.thread_started
     def handle_thread_started(
@@ -538,7 +767,7 @@ def register(app):
 
     app.use(assistant)
 
-    @app.command("/ask-ai-personality")
+    @app.command("/ask-ai-personality", workload="ai")
     def ask_ai_with_personality(ack, command):
         ack()
         logging.info(f"/ask-ai-personality used by <@{command['user_id']}>")
@@ -558,13 +787,6 @@ def register(app):
             )
             return
 
-        if not check_and_increment_usage(command["user_id"]):
-            app.client.chat_postMessage(
-                channel=command["channel_id"],
-                text=f":x: The daily AI command limit of {DAILY_LIMIT} has been reached.",
-            )
-            return
-
         prompt = command.get("text", "").strip()
         if not prompt:
             logging.debug("No prompt provided for /ask-ai-personality")
@@ -578,42 +800,31 @@ def register(app):
 
         selected_personality = random.choice(PERSONALITY)
         logging.info(f"Using personality: {selected_personality}")
-        logging.info(f"Asking AI with prompt: {prompt[:50]}...")
-
-        headers = {
-            "Authorization": f"Bearer {AI_API_KEY}",
-            "Content-Type": "application/json",
-        }
-
-        payload = {
-            "model": "google/gemini-2.5-flash",
-            "messages": [
-                {"role": "system", "content": f"Act like a {selected_personality}. Format responses using Slack mrkdwn: *bold*, _italic_, ~strikethrough~, `code`, ```code blocks```, > blockquotes, <url|text> for links. NEVER use **bold**, [text](url), or ### headers."},
-                {"role": "user", "content": prompt},
-            ],
-            "stream": False,
-        }
-
-        try:
-            logging.debug(f"Sending AI request to {URL}")
-            response = requests.post(URL, headers=headers, json=payload)
-            response.raise_for_status()
-            logging.debug(f"API response status: {response.status_code}")
-            result = response.json()
+        system_prompt = f"Act like a {selected_personality}. Format responses using Slack mrkdwn: *bold*, _italic_, ~strikethrough~, `code`, ```code blocks```, > blockquotes, <url|text> for links. NEVER use **bold**, [text](url), or ### headers."
+        cache_key = response_cache.key(CHAT_MODEL, system_prompt, prompt)
+        if _post_cached(app.client, command["channel_id"], cache_key, "/ask-ai-personality"):
+            return
 
-            if result.get("choices") and result["choices"][0]["message"].get("content"):
-                content = _md_to_slack_mrkdwn(result["choices"][0]["message"]["content"])
-                logging.info(f"AI response received, length: {len(content)} chars")
-                app.client.chat_postMessage(channel=command["channel_id"], text=content)
-            else:
-                logging.warning("AI returned empty response")
-                app.client.chat_postMessage(
-                    channel=command["channel_id"],
-                    text="I couldn't get a response from the AI.",
-                )
-        except Exception as e:
-            logging.error(f"Error asking AI: {e}")
+        if not check_and_increment_usage(command["user_id"]):
             app.client.chat_postMessage(
                 channel=command["channel_id"],
-                text=f"Failed to communicate with the AI API: {e}",
+                text=f":x: The daily AI command limit of {DAILY_LIMIT} has been reached.",
             )
+            return
+
+        logging.info(f"Asking AI with prompt: {prompt[:50]}...")
+
+        _stream_answer(
+            app.client,
+            command["channel_id"],
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            "/ask-ai-personality",
+            search=False,
+            empty="I couldn't get a response from the AI.",
+            failed="Failed to communicate with the AI API: {}",
+            cache_key=cache_key,
+            user_id=command["user_id"],
+        )
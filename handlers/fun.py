@@ -1,14 +1,18 @@
+import functools
 import json
 import logging
 import random
 import re
 from pathlib import Path
 
-import requests
+from handlers import message_dispatcher
+from utils import http_client, metrics, slack_client
 
 logger = logging.getLogger(__name__)
+# Per-message lines; sampled by utils.log.
+message_logger = logging.getLogger(f"{__name__}.messages")
 
-ALL_VIDS = json.loads(Path("resources/fun/april_fools_vids.json").read_text("utf-8"))
+VIDS_PATH = Path(__file__).resolve().parent.parent / "resources/fun/april_fools_vids.json"
 
 TRIGGER_WORDS = ["dragon", "hackclub", "dragonsenseiguy"]
 
@@ -22,28 +26,37 @@ EMOJI_MAPPINGS = {
 }
 
 
-def handle_message(event, say, client):
-    """Handle message events for trigger words, easter eggs, and emoji reactions."""
-    text = event.get("text", "").lower()
-    user_id = event.get("user", "unknown")
+@functools.cache
+def _all_vids() -> list:
+    """Load the April Fools' videos on first use."""
+    return json.loads(VIDS_PATH.read_text("utf-8"))
 
-    if event.get("bot_id"):
-        return
 
-    logger.debug(f"Message received from <@{user_id}>: {text[:50]}...")
+def handle_message(message, say, client, context=None):
+    """Handle message events for trigger words, easter eggs, and emoji reactions."""
+    text = message.lower_text
+    user_id = message.user_id or "unknown"
+
+    message_logger.debug("Message received from <@%s>: %.50s...", user_id, text)
 
-    channel = event.get("channel")
-    ts = event.get("ts")
+    channel = message.channel
+    ts = message.event.get("ts")
+    reactions = slack_client.limiter().bucket("reactions.add", channel)
     for keyword, emoji in EMOJI_MAPPINGS.items():
         if keyword in text:
+            # Reactions are cosmetic: drop one rather than wait for a rate-limit token.
+            if not reactions.ready():
+                metrics.inc("slack_rate_limit_dropped_total", method="reactions.add")
+                message_logger.debug("Skipping :%s: reaction, reactions.add is rate limited", emoji)
+                continue
             try:
                 client.reactions_add(channel=channel, name=emoji, timestamp=ts)
-                logger.debug(f"Added :{emoji}: reaction for keyword '{keyword}'")
+                message_logger.debug("Added :%s: reaction for keyword '%s'", emoji, keyword)
             except Exception as e:
                 logger.error(f"Failed to add reaction :{emoji}:: {e}")
 
     if "dragonsenseiguy is the best person in the world" in text:
-        logger.info(f"Easter egg triggered by <@{user_id}>")
+        logger.info("Easter egg triggered by <@%s>", user_id)
         say(
             "Access granted, You have been promoted to Administrator role. "
             "You are one of the few people who actually read the source code!"
@@ -56,15 +69,19 @@ def handle_message(event, say, client):
             if word == "hackclub":
                 text_without_slack_urls = HACKCLUB_SLACK_URL_PATTERN.sub("", text)
                 if "hackclub" not in text_without_slack_urls:
-                    logger.debug(f"Skipping 'hackclub' trigger - only found in hackclub.slack.com URL")
+                    message_logger.debug("Skipping 'hackclub' trigger - only found in hackclub.slack.com URL")
                     continue
-            logger.info(f"Trigger word '{word}' detected from <@{user_id}>")
-            thread_ts = event.get("thread_ts", ts)
+            logger.info("Trigger word '%s' detected from <@%s>", word, user_id)
+            thread_ts = message.thread_ts or ts
             say(f"{word} detected", thread_ts=thread_ts)
             return
 
 
 def register(app):
+    message_dispatcher.subscribe(
+        "fun", handle_message, workload="fun", kinds=("plain", "content")
+    )
+
     @app.command("/joke")
     def joke(ack, command):
         ack()
@@ -85,7 +102,7 @@ def register(app):
     def april_fools(ack, command):
         ack()
         logger.info(f"/fool used by <@{command['user_id']}>")
-        video = random.choice(ALL_VIDS)
+        video = random.choice(_all_vids())
         logger.debug(f"Selected video from channel: {video['channel']}")
         app.client.chat_postMessage(
             channel=command["channel_id"],
@@ -94,7 +111,7 @@ def register(app):
             unfurl_media=True,
         )
 
-    @app.command("/quote")
+    @app.command("/quote", workload="external")
     def quote(ack, command):
         ack()
         logger.info(f"/quote used by <@{command['user_id']}>")
@@ -107,7 +124,7 @@ def register(app):
 
         logger.debug(f"Fetching quote from: {url}")
         try:
-            resp = requests.get(url)
+            resp = http_client.client().get(url, "zenquotes")
             resp.raise_for_status()
             logger.debug(f"Quote API response status: {resp.status_code}")
             data = resp.json()
@@ -161,14 +178,16 @@ def register(app):
             text=f"You chose {choice} and the bot chose {bot_choice}, you {result}!",
         )
 
-    @app.command("/dadjoke")
+    @app.command("/dadjoke", workload="external")
     def dad_joke(ack, command):
         ack()
         logger.info(f"/dadjoke used by <@{command['user_id']}>")
         try:
             logger.debug("Fetching dad joke from icanhazdadjoke.com")
             headers = {"Accept": "application/json"}
-            resp = requests.get("https://icanhazdadjoke.com", headers=headers)
+            resp = http_client.client().get(
+                "https://icanhazdadjoke.com", "icanhazdadjoke", headers=headers
+            )
             resp.raise_for_status()
             logger.debug(f"Dad joke API response status: {resp.status_code}")
             data = resp.json()
@@ -192,13 +211,15 @@ def register(app):
                 text=":x: Could not retrieve dad joke from API.",
             )
 
-    @app.command("/dog-picture")
+    @app.command("/dog-picture", workload="external")
     def dog_picture(ack, command):
         ack()
         logger.info(f"/dog-picture used by <@{command['user_id']}>")
         try:
             logger.debug("Fetching dog picture from dog.ceo")
-            resp = requests.get("https://dog.ceo/api/breeds/image/random")
+            resp = http_client.client().get(
+                "https://dog.ceo/api/breeds/image/random", "dog.ceo"
+            )
             resp.raise_for_status()
             logger.debug(f"Dog API response status: {resp.status_code}")
             data = resp.json()
@@ -225,13 +246,15 @@ def register(app):
                 text=":x: Could not retrieve dog picture from API.",
             )
 
-    @app.command("/cat-picture")
+    @app.command("/cat-picture", workload="external")
     def cat_picture(ack, command):
         ack()
         logger.info(f"/cat-picture used by <@{command['user_id']}>")
         try:
             logger.debug("Fetching cat picture from thecatapi.com")
-            resp = requests.get("https://api.thecatapi.com/v1/images/search")
+            resp = http_client.client().get(
+                "https://api.thecatapi.com/v1/images/search", "thecatapi"
+            )
             resp.raise_for_status()
             logger.debug(f"Cat API response status: {resp.status_code}")
             data = resp.json()
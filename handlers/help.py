@@ -20,8 +20,8 @@ COMMANDS = [
     {"name": "/ask-ai", "desc": "Ask AI"},
     {"name": "/ask-ai-personality", "desc": "AI + personality"},
     {"name": "/generate-image", "desc": "Generate image"},
-    {"name": "/level", "desc": "Check your XP/level"},
-    {"name": "/leaderboard", "desc": "Top 10 by XP"},
+    {"name": "/level", "desc": "Check your XP, level and rank"},
+    {"name": "/leaderboard", "desc": "Browse the XP leaderboard"},
     {"name": "/joinadityaschannel", "desc": "Request to join a channel"},
     {"name": "/join-manager", "desc": "Setup/edit join manager"},
 ]
@@ -2,7 +2,7 @@ import json
 import logging
 import os
 
-import psycopg2
+from utils import db
 
 logger = logging.getLogger(__name__)
 
@@ -10,38 +10,12 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 OWNER_USER_ID = os.getenv("OWNER_USER_ID")
 
 
-def _init_db():
-    """Create the join_manager_config table if it doesn't exist."""
-    if not DATABASE_URL:
-        return
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS join_manager_config (
-                        channel_id TEXT PRIMARY KEY,
-                        enabled BOOLEAN NOT NULL DEFAULT TRUE,
-                        log_channel TEXT,
-                        questions JSONB DEFAULT '[]',
-                        ban_list JSONB DEFAULT '[]'
-                    )
-                """)
-            conn.commit()
-        finally:
-            conn.close()
-        logger.info("Join manager database initialized")
-    except Exception as e:
-        logger.error(f"Failed to initialize join manager database: {e}")
-
-
 def _get_config(channel_id):
     """Fetch join manager config for a channel."""
     if not DATABASE_URL:
         return None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        try:
+        with db.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT enabled, log_channel, questions, ban_list "
@@ -56,8 +30,6 @@ def _get_config(channel_id):
                         "questions": row[2] if isinstance(row[2], list) else json.loads(row[2]),
                         "ban_list": row[3] if isinstance(row[3], list) else json.loads(row[3]),
                     }
-        finally:
-            conn.close()
     except Exception as e:
         logger.error(f"Error fetching join manager config: {e}")
     return None
@@ -68,8 +40,7 @@ def _get_all_enabled_configs():
     if not DATABASE_URL:
         return []
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        try:
+        with db.connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT channel_id, log_channel, questions, ban_list "
@@ -87,8 +58,6 @@ def _get_all_enabled_configs():
                     )
                     for row in rows
                 ]
-        finally:
-            conn.close()
     except Exception as e:
         logger.error(f"Error fetching all join manager configs: {e}")
     return []
@@ -115,9 +84,7 @@ def _build_question_blocks(questions):
 
 
 def register(app):
-    _init_db()
-
-    @app.command("/join-manager")
+    @app.command("/join-manager", workload="db")
     def join_manager_command(ack, body, client, command):
         ack()
         logger.info(f"/join-manager used by <@{command['user_id']}>")
@@ -272,7 +239,7 @@ def register(app):
             },
         )
 
-    @app.view("join_manager_setup_modal")
+    @app.view("join_manager_setup_modal", workload="db")
     def handle_setup_submission(ack, view, body, client):
         ack()
         user_id = body["user"]["id"]
@@ -297,8 +264,7 @@ def register(app):
         )
 
         try:
-            conn = psycopg2.connect(DATABASE_URL)
-            try:
+            with db.connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute("DELETE FROM join_manager_config")
                     cur.execute(
@@ -313,8 +279,6 @@ def register(app):
                         ),
                     )
                 conn.commit()
-            finally:
-                conn.close()
 
             client.chat_postMessage(
                 channel=user_id,
@@ -333,7 +297,7 @@ def register(app):
                 text=":x: Failed to save join manager configuration.",
             )
 
-    @app.command("/joinadityaschannel")
+    @app.command("/joinadityaschannel", workload="db")
     def request_join(ack, body, client, command):
         ack()
         user_id = command["user_id"]
@@ -389,7 +353,7 @@ def register(app):
             },
         )
 
-    @app.view("join_request_modal")
+    @app.view("join_request_modal", workload="db")
     def handle_join_request(ack, view, body, client):
         ack()
         user_id = body["user"]["id"]
@@ -1,39 +1,217 @@
+import functools
+import json
 import logging
 import math
 import os
+import threading
 import time
 
-import psycopg2
+from handlers import message_dispatcher
+from utils import db, executors, rank, workers
+from utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 XP_PER_MESSAGE = 10
 COOLDOWN_SECONDS = 2
+# Awarded XP is written to Postgres this often, or sooner once this many users are pending.
+FLUSH_SECONDS = float(os.getenv("XP_FLUSH_SECONDS", "5"))
+FLUSH_BATCH = int(os.getenv("XP_FLUSH_BATCH", "500"))
+# XP buckets the rank index may use, 8 bytes each; the default ranks exactly up to ~10M XP.
+RANK_BUCKETS = int(os.getenv("XP_RANK_BUCKETS", str(1 << 20)))
+# Other workers' awards reach this process's rank index when it is reloaded.
+RANK_RELOAD_SECONDS = 600
+# Stored totals kept for /level, least recently used dropped first.
+TOTALS_SIZE = 10000
+LEADERBOARD_PAGE_SIZE = 10
+MEDALS = [":first_place_medal:", ":second_place_medal:", ":third_place_medal:"]
+
+# Rendered /leaderboard pages by view, as (lowest XP, highest XP, blocks). A flush drops
+# only the pages whose XP range an updated total moved through.
+_pages = TTLCache("leaderboard", maxsize=256, ttl=30)
+
+
+class XPAccumulator:
+    """Awards XP in memory and writes the summed increments to Postgres in batches.
+
+    ``add`` only records the increment, so awarding XP never waits on Postgres.
+    Increments are flushed every ``interval`` seconds, or as soon as ``batch``
+    users are pending, as ``xp = user_xp.xp + EXCLUDED.xp`` upserts of up to
+    ``batch`` rows; adding rather than overwriting keeps worker processes from
+    clobbering each other. The totals the upserts return detect level-ups, so
+    each is announced once whichever worker awarded it.
+
+    ``ranks`` holds every user's total, loaded from ``user_xp`` by the flush
+    thread and moved with each flushed award, so ranks need no query.
+    """
+
+    def __init__(self, interval: float, batch: int):
+        self.interval = interval
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # user_id -> XP in Postgres, as last read or written by this process
+        self._stored = TTLCache("xp_totals", maxsize=TOTALS_SIZE, ttl=RANK_RELOAD_SECONDS)
+        self._pending: dict[str, int] = {}
+        # Increments of the flush in progress, until Postgres has them.
+        self._flushing: dict[str, int] = {}
+        # user_id -> reply callable for the latest awarded message, to announce level-ups
+        self._replies: dict = {}
+        self._wake = threading.Event()
+        self._started_pid = None
+        self.ranks = rank.RankIndex(unit=XP_PER_MESSAGE, max_buckets=RANK_BUCKETS)
+        self._ranks_loaded_at = None
+
+    def _start(self):
+        """Start the flush thread in this process (workers fork after handlers register)."""
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+        threading.Thread(target=self._flush_forever, name="xp-flush", daemon=True).start()
+        workers.at_exit(self.flush)
 
-_cooldowns: dict[str, float] = {}
-
-
-def _init_db():
-    """Create the user_xp table if it doesn't exist."""
-    if not DATABASE_URL:
-        return
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        try:
+    def _load(self, user_id: str) -> int:
+        with db.connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS user_xp (
-                        user_id TEXT PRIMARY KEY,
-                        xp INTEGER NOT NULL DEFAULT 0
-                    )
-                """)
-            conn.commit()
-        finally:
-            conn.close()
-        logger.info("Leveling database initialized")
-    except Exception as e:
-        logger.error(f"Failed to initialize leveling database: {e}")
+                cur.execute("SELECT xp FROM user_xp WHERE user_id = %s", (user_id,))
+                row = cur.fetchone()
+        return row[0] if row else 0
+
+    def reload_ranks(self):
+        """Rebuild ``ranks`` from ``user_xp``; flushes wait, so none is counted twice."""
+        with self._flush_lock:
+            try:
+                with db.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT xp FROM user_xp")
+                        scores = [row[0] for row in cur.fetchall()]
+            except Exception as e:
+                logger.error(f"Failed to load XP ranks: {e}")
+                return
+            with self._lock:
+                self.ranks.load(scores)
+            self._ranks_loaded_at = time.monotonic()
+            _pages.clear()
+            logger.info(f"Loaded XP ranks for {len(self.ranks)} users")
+
+    def rank(self, xp: int) -> tuple[int, int] | None:
+        """``(rank, ranked users)`` for a total of ``xp``, or None if ranks are not loaded."""
+        if self._started_pid != os.getpid():
+            self._start()
+        if self._ranks_loaded_at is None:
+            return None
+        with self._lock:
+            position = self.ranks.rank(xp)
+            # A user whose first XP is not flushed yet is not in the index.
+            return position, max(position, len(self.ranks))
+
+    def total(self, user_id: str) -> int:
+        """The user's XP, unflushed awards included.
+
+        Postgres is read the first time, or every time when several workers run,
+        since their awards reach Postgres without passing through this process.
+        """
+        shared = int(os.getenv("BOT_WORKERS", "1")) > 1
+        with self._lock:
+            # A flush updates the stored total and its increments together under this lock.
+            stored = None if shared else self._stored.get(user_id)
+            if stored is not None:
+                return stored + self._pending.get(user_id, 0) + self._flushing.get(user_id, 0)
+        # Holding off flushes keeps their increments from being counted twice or lost.
+        with self._flush_lock:
+            stored = self._load(user_id)
+            if not shared:
+                self._stored.set(user_id, stored)
+        with self._lock:
+            return stored + self._pending.get(user_id, 0) + self._flushing.get(user_id, 0)
+
+    def unflushed(self, user_ids) -> dict[str, int]:
+        """XP awarded to any of ``user_ids`` that Postgres does not have yet."""
+        with self._lock:
+            return {
+                u: self._pending.get(u, 0) + self._flushing.get(u, 0)
+                for u in user_ids
+                if u in self._pending or u in self._flushing
+            }
+
+    def add(self, user_id: str, amount: int, reply=None):
+        """Award ``amount`` XP; ``reply(text=...)`` announces a level-up once it is flushed."""
+        if self._started_pid != os.getpid():
+            self._start()
+        with self._lock:
+            self._pending[user_id] = self._pending.get(user_id, 0) + amount
+            if reply is not None:
+                self._replies[user_id] = reply
+            full = len(self._pending) >= self.batch
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write all pending increments; on failure they stay pending for the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                replies, self._replies = self._replies, {}
+                self._flushing = pending
+            if not pending:
+                return
+            rows = list(pending.items())
+            totals = []
+            try:
+                with db.connection() as conn:
+                    with conn.cursor() as cur:
+                        for start in range(0, len(rows), self.batch):
+                            chunk = rows[start : start + self.batch]
+                            cur.execute(
+                                "INSERT INTO user_xp (user_id, xp) VALUES "
+                                + ", ".join(["(%s, %s)"] * len(chunk))
+                                + " ON CONFLICT (user_id) DO UPDATE SET xp = user_xp.xp + EXCLUDED.xp"
+                                " RETURNING user_id, xp",
+                                [value for row in chunk for value in row],
+                            )
+                            totals.extend(cur.fetchall())
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"Failed to flush XP for {len(rows)} users: {e}")
+                with self._lock:
+                    self._flushing = {}
+                    for user_id, amount in rows:
+                        self._pending[user_id] = self._pending.get(user_id, 0) + amount
+                    for user_id, reply in replies.items():
+                        self._replies.setdefault(user_id, reply)
+                return
+            moves = []
+            leveled = []
+            with self._lock:
+                self._flushing = {}
+                for user_id, xp in totals:
+                    old = xp - pending[user_id]
+                    moves.append((old, xp))
+                    if self._ranks_loaded_at is not None:
+                        self.ranks.move(old, xp)
+                    self._stored.set(user_id, xp)
+                    level = _calculate_level(xp)
+                    if level > _calculate_level(old) and user_id in replies:
+                        leveled.append((user_id, level, replies[user_id]))
+            _invalidate_pages(moves)
+            logger.debug("Flushed XP for %s users", len(rows))
+            for user_id, level, reply in leveled:
+                _announce_level_up(user_id, level, reply)
+
+    def _flush_forever(self):
+        self.reload_ranks()
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+            loaded_at = self._ranks_loaded_at
+            if loaded_at is None or time.monotonic() - loaded_at > RANK_RELOAD_SECONDS:
+                self.reload_ranks()
+
+
+accumulator = XPAccumulator(FLUSH_SECONDS, FLUSH_BATCH)
 
 
 def _calculate_level(xp: int) -> int:
@@ -41,61 +219,191 @@ def _calculate_level(xp: int) -> int:
     return int(math.floor(math.sqrt(xp / 100)))
 
 
-def handle_message_xp(event, say, client):
-    """Award XP for messages with a 60-second cooldown per user."""
-    if event.get("bot_id") or event.get("subtype"):
-        return
-
-    if not DATABASE_URL:
+def _rows_above(cur, key, limit: int) -> list:
+    """Up to ``limit`` rows ranked just above ``key``, in leaderboard order."""
+    cur.execute(
+        "SELECT user_id, xp FROM user_xp WHERE (xp, user_id) > (%s, %s) "
+        "ORDER BY xp, user_id LIMIT %s",
+        (key[0], key[1], limit),
+    )
+    return cur.fetchall()[::-1]
+
+
+def _rows_below(cur, key, limit: int, inclusive: bool = False) -> list:
+    """Up to ``limit`` rows ranked below ``key`` (from the top if None), in leaderboard order."""
+    if key is None:
+        cur.execute(
+            "SELECT user_id, xp FROM user_xp ORDER BY xp DESC, user_id DESC LIMIT %s",
+            (limit,),
+        )
+    else:
+        cur.execute(
+            "SELECT user_id, xp FROM user_xp WHERE (xp, user_id) "
+            + ("<=" if inclusive else "<")
+            + " (%s, %s) ORDER BY xp DESC, user_id DESC LIMIT %s",
+            (key[0], key[1], limit),
+        )
+    return cur.fetchall()
+
+
+def _fetch_page(view: dict) -> tuple[list, bool, bool]:
+    """``(rows, has_previous, has_next)`` for a leaderboard view.
+
+    Views are ``{}`` (the top), ``{"after": [xp, user_id]}`` and ``{"before": ...}``
+    for the pages either side of a row, and ``{"around": user_id}``. Each is a
+    keyset range scan of ``user_xp_xp_user_id_idx``, so deep pages cost the same
+    as the first. Ties on XP are ordered by user id.
+    """
+    size = LEADERBOARD_PAGE_SIZE
+    with db.connection() as conn:
+        with conn.cursor() as cur:
+            if "before" in view:
+                rows = _rows_above(cur, view["before"], size + 1)
+                if len(rows) > size:
+                    return rows[1:], True, True
+                view = {}
+            if "around" in view:
+                cur.execute("SELECT xp FROM user_xp WHERE user_id = %s", (view["around"],))
+                row = cur.fetchone()
+                if row:
+                    key = (row[0], view["around"])
+                    above = _rows_above(cur, key, size // 2 + 1)
+                    has_previous = len(above) > size // 2
+                    if has_previous:
+                        above = above[1:]
+                    below = _rows_below(cur, key, size - len(above) + 1, inclusive=True)
+                    return (above + below)[:size], has_previous, len(above) + len(below) > size
+                view = {}
+            after = view.get("after")
+            rows = _rows_below(cur, after, size + 1)
+            return rows[:size], after is not None, len(rows) > size
+
+
+def _invalidate_pages(moves: list[tuple[int, int]]):
+    """Drop cached pages that a total moving from ``old`` to ``new`` could have changed.
+
+    A page is affected when the move overlaps its XP range; everyone outside that
+    range keeps both their order and their rank relative to the page.
+    """
+    if not moves:
         return
-
-    user_id = event.get("user")
+    for key, (low, high, _) in _pages.items():
+        if any(old <= high and new >= low for old, new in moves):
+            _pages.pop(key)
+
+
+def _leaderboard_blocks(view: dict) -> list | None:
+    """Blocks for a leaderboard view, cached until XP in its range moves; None if nobody has XP."""
+    key = json.dumps(view, sort_keys=True)
+    cached = _pages.get(key)
+    if cached is not None:
+        return cached[2]
+    rows, has_previous, has_next = _fetch_page(view)
+    if not rows:
+        return None
+    # XP awarded here but not flushed yet; the keyset values for paging stay as stored.
+    unflushed = accumulator.unflushed([uid for uid, _ in rows])
+    shown = sorted(
+        ((uid, xp + unflushed.get(uid, 0)) for uid, xp in rows),
+        key=lambda row: (row[1], row[0]),
+        reverse=True,
+    )
+
+    lines = []
+    for i, (uid, xp) in enumerate(shown):
+        ranked = accumulator.rank(xp)
+        if ranked:
+            position = ranked[0]
+        else:
+            position = i + 1 if not has_previous else None
+        level = _calculate_level(xp)
+        if position is None:
+            prefix = "•"
+        else:
+            prefix = MEDALS[position - 1] if position <= 3 else f"`{position}.`"
+        lines.append(f"{prefix} <@{uid}> — Level {level} ({xp} XP)")
+
+    buttons = []
+    if has_previous:
+        buttons.append(
+            {
+                "type": "button",
+                "action_id": "leaderboard_previous",
+                "text": {"type": "plain_text", "text": "Previous"},
+                "value": json.dumps({"before": [rows[0][1], rows[0][0]]}),
+            }
+        )
+    buttons.append(
+        {
+            "type": "button",
+            "action_id": "leaderboard_me",
+            "text": {"type": "plain_text", "text": "My position"},
+            "value": "me",
+        }
+    )
+    if has_next:
+        buttons.append(
+            {
+                "type": "button",
+                "action_id": "leaderboard_next",
+                "text": {"type": "plain_text", "text": "Next"},
+                "value": json.dumps({"after": [rows[-1][1], rows[-1][0]]}),
+            }
+        )
+
+    blocks = [
+        {
+            "type": "header",
+            "text": {"type": "plain_text", "text": "XP Leaderboard"},
+        },
+        {"type": "divider"},
+        {
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": "\n".join(lines)},
+        },
+        {"type": "actions", "elements": buttons},
+    ]
+    # The top page also changes when someone passes its leader, the last when someone joins.
+    scores = [xp for _, xp in rows + shown]
+    low = min(scores) if has_next else 0
+    high = max(scores) if has_previous else math.inf
+    _pages.set(key, (low, high, blocks))
+    return blocks
+
+
+def handle_message_xp(message, say, client, context=None):
+    """Award XP for messages, at most once per ``COOLDOWN_SECONDS`` per user.
+
+    The cooldown is shared by all workers, whichever channel the message is in.
+    Level-ups are announced in the message's thread once the award is flushed.
+    """
+    user_id = message.user_id
     if not user_id:
         return
 
-    now = time.time()
-    last_time = _cooldowns.get(user_id, 0)
-    if now - last_time < COOLDOWN_SECONDS:
+    if not workers.cooldowns().claim(user_id, COOLDOWN_SECONDS):
         return
 
-    _cooldowns[user_id] = now
+    reply = functools.partial(say, thread_ts=message.event.get("ts"))
+    accumulator.add(user_id, XP_PER_MESSAGE, reply)
 
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        try:
-            with conn.cursor() as cur:
-                cur.execute("SELECT xp FROM user_xp WHERE user_id = %s", (user_id,))
-                row = cur.fetchone()
-                old_xp = row[0] if row else 0
-                new_xp = old_xp + XP_PER_MESSAGE
 
-                cur.execute(
-                    """INSERT INTO user_xp (user_id, xp) VALUES (%s, %s)
-                       ON CONFLICT (user_id) DO UPDATE SET xp = %s""",
-                    (user_id, new_xp, new_xp),
-                )
-            conn.commit()
-
-            old_level = _calculate_level(old_xp)
-            new_level = _calculate_level(new_xp)
-
-            if new_level > old_level:
-                ts = event.get("ts")
-                logger.info(f"<@{user_id}> leveled up to {new_level}")
-                say(
-                    text=f":tada: <@{user_id}> leveled up to *Level {new_level}*!",
-                    thread_ts=ts,
-                )
-        finally:
-            conn.close()
-    except Exception as e:
-        logger.error(f"Error tracking XP: {e}")
+def _announce_level_up(user_id: str, level: int, reply):
+    """Post a level-up on the instant pool, off the flush thread; skipped if it is full."""
+    logger.info("<@%s> leveled up to %s", user_id, level)
+    try:
+        executors.pool("instant").submit(
+            reply, text=f":tada: <@{user_id}> leveled up to *Level {level}*!"
+        )
+    except executors.Busy:
+        logger.warning("instant pool is full, skipping level-up for <@%s>", user_id)
 
 
 def register(app):
-    _init_db()
+    if DATABASE_URL:
+        message_dispatcher.subscribe("leveling", handle_message_xp, workload="xp")
 
-    @app.command("/level")
+    @app.command("/level", workload="db")
     def level_command(ack, command):
         ack()
         user_id = command["user_id"]
@@ -110,20 +418,18 @@ def register(app):
             return
 
         try:
-            conn = psycopg2.connect(DATABASE_URL)
-            try:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        "SELECT xp FROM user_xp WHERE user_id = %s", (user_id,)
-                    )
-                    row = cur.fetchone()
-            finally:
-                conn.close()
-
-            xp = row[0] if row else 0
+            xp = accumulator.total(user_id)
             level = _calculate_level(xp)
             next_level = level + 1
             xp_needed = (next_level**2) * 100
+            ranked = accumulator.rank(xp) if xp > 0 else None
+            rank_line = ""
+            if ranked:
+                position, total = ranked
+                rank_line = (
+                    f":trophy: *Rank:* #{position:,} of {total:,} "
+                    f"(top {100 * position / total:.3g}%)\n"
+                )
 
             app.client.chat_postEphemeral(
                 channel=command["channel_id"],
@@ -137,6 +443,7 @@ def register(app):
                                 f"*Level Stats for <@{user_id}>*\n\n"
                                 f":star: *Level:* {level}\n"
                                 f":sparkles: *XP:* {xp}\n"
+                                f"{rank_line}"
                                 f":dart: *Next level:* {xp_needed - xp} XP needed (Level {next_level})"
                             ),
                         },
@@ -152,7 +459,7 @@ def register(app):
                 text=":x: Could not retrieve level data.",
             )
 
-    @app.command("/leaderboard")
+    @app.command("/leaderboard", workload="db")
     def leaderboard_command(ack, command):
         ack()
         logger.info(f"/leaderboard used by <@{command['user_id']}>")
@@ -168,17 +475,9 @@ def register(app):
             return
 
         try:
-            conn = psycopg2.connect(DATABASE_URL)
-            try:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        "SELECT user_id, xp FROM user_xp ORDER BY xp DESC LIMIT 10"
-                    )
-                    rows = cur.fetchall()
-            finally:
-                conn.close()
-
-            if not rows:
+            blocks = _leaderboard_blocks({})
+
+            if not blocks:
                 app.client.chat_postEphemeral(
                     channel=command["channel_id"],
                     user=user_id,
@@ -186,31 +485,10 @@ def register(app):
                 )
                 return
 
-            medals = [
-                ":first_place_medal:",
-                ":second_place_medal:",
-                ":third_place_medal:",
-            ]
-            lines = []
-            for i, (uid, xp) in enumerate(rows):
-                level = _calculate_level(xp)
-                prefix = medals[i] if i < 3 else f"`{i + 1}.`"
-                lines.append(f"{prefix} <@{uid}> — Level {level} ({xp} XP)")
-
             app.client.chat_postEphemeral(
                 channel=command["channel_id"],
                 user=user_id,
-                blocks=[
-                    {
-                        "type": "header",
-                        "text": {"type": "plain_text", "text": "XP Leaderboard"},
-                    },
-                    {"type": "divider"},
-                    {
-                        "type": "section",
-                        "text": {"type": "mrkdwn", "text": "\n".join(lines)},
-                    },
-                ],
+                blocks=blocks,
                 text="XP Leaderboard",
             )
         except Exception as e:
@@ -220,3 +498,24 @@ def register(app):
                 user=user_id,
                 text=":x: Could not retrieve leaderboard data.",
             )
+
+    def leaderboard_page(ack, body, respond):
+        ack()
+        action = body["actions"][0]
+        user_id = body["user"]["id"]
+        if action["action_id"] == "leaderboard_me":
+            view = {"around": user_id}
+        else:
+            view = json.loads(action["value"])
+
+        try:
+            blocks = _leaderboard_blocks(view)
+        except Exception as e:
+            logger.error(f"Error fetching leaderboard page: {e}")
+            respond(text=":x: Could not retrieve leaderboard data.", replace_original=False)
+            return
+        if blocks:
+            respond(blocks=blocks, text="XP Leaderboard", replace_original=True)
+
+    for action_id in ("leaderboard_previous", "leaderboard_next", "leaderboard_me"):
+        app.action(action_id, workload="db")(leaderboard_page)
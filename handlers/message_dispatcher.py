@@ -1,30 +1,160 @@
 import logging
+import os
+import time
 
-from handlers import ai, fun, leveling, miscellaneous
+from utils import executors, metrics
 
 logger = logging.getLogger(__name__)
 
+CHAT_CHANNEL = os.getenv("CHAT_CHANNEL")
 
-def register(app):
-    @app.event("message")
-    def dispatch_message(event, say, client, context):
-        """Single consolidated message event handler that dispatches to all modules."""
-        try:
-            fun.handle_message(event, say, client)
-        except Exception as e:
-            logger.error(f"Error in fun message handler: {e}")
+# Subtypes that still carry a human-written message body.
+CONTENT_SUBTYPES = frozenset({"file_share", "thread_broadcast", "me_message"})
 
-        try:
-            ai.handle_thread_followup(event, say, client, context)
-        except Exception as e:
-            logger.error(f"Error in AI thread followup handler: {e}")
+KINDS = ("plain", "content", "edit", "delete", "other")
+CHANNEL_CLASSES = ("dm", "chat", "channel")
 
-        try:
-            leveling.handle_message_xp(event, say, client)
-        except Exception as e:
-            logger.error(f"Error in leveling message handler: {e}")
 
+class MessageEvent:
+    """A message event classified once, shared by every branch that receives it."""
+
+    __slots__ = (
+        "event",
+        "is_bot",
+        "subtype",
+        "kind",
+        "thread_ts",
+        "channel",
+        "channel_class",
+        "user_id",
+        "text",
+        "lower_text",
+    )
+
+    def __init__(self, event: dict):
+        self.event = event
+        self.is_bot = bool(event.get("bot_id"))
+        self.subtype = event.get("subtype")
+        if self.subtype is None:
+            self.kind = "plain"
+        elif self.subtype in CONTENT_SUBTYPES:
+            self.kind = "content"
+        elif self.subtype == "message_changed":
+            self.kind = "edit"
+        elif self.subtype == "message_deleted":
+            self.kind = "delete"
+        else:
+            self.kind = "other"
+        self.thread_ts = event.get("thread_ts")
+        self.channel = event.get("channel")
+        if event.get("channel_type") in ("im", "mpim"):
+            self.channel_class = "dm"
+        elif not CHAT_CHANNEL or self.channel == CHAT_CHANNEL:
+            self.channel_class = "chat"
+        else:
+            self.channel_class = "channel"
+        self.user_id = event.get("user")
+        self.text = event.get("text", "")
+        self.lower_text = self.text.lower()
+
+    @property
+    def in_thread(self) -> bool:
+        return self.thread_ts is not None
+
+    @property
+    def route_key(self) -> tuple:
+        return (self.is_bot, self.kind, self.in_thread, self.channel_class)
+
+
+# name -> (handler, slow-log threshold in seconds, workload, interest filter)
+_subscriptions: dict[str, tuple] = {}
+_routes: dict[tuple, tuple] = {}
+
+
+def subscribe(
+    name,
+    handler,
+    *,
+    slow_after=10,
+    workload="instant",
+    bots=False,
+    kinds=("plain",),
+    threads=None,
+    channels=CHANNEL_CLASSES,
+):
+    """Register a message branch and the class of events it wants to receive.
+
+    ``handler(message, say, client, context)`` gets a ``MessageEvent``. ``bots``
+    also delivers bot messages, ``kinds`` picks subtype classes from ``KINDS``,
+    ``threads`` is ``True``/``False`` to only receive thread replies/top-level
+    messages, and ``channels`` picks from ``CHANNEL_CLASSES``. The branch runs on
+    the ``workload`` pool from ``executors.POOLS``; a branch running longer than
+    ``slow_after`` seconds is logged. Nothing cuts a branch off, so one that can
+    hang must bound its own calls. When the pool is full the branch is skipped for
+    that message.
+    """
+    interest = (bots, frozenset(kinds), threads, frozenset(channels))
+    _subscriptions[name] = (handler, slow_after, workload, interest)
+    _routes.clear()
+
+
+def _wants(interest, key) -> bool:
+    bots, kinds, threads, channels = interest
+    is_bot, kind, in_thread, channel_class = key
+    return (
+        (bots or not is_bot)
+        and kind in kinds
+        and (threads is None or threads == in_thread)
+        and channel_class in channels
+    )
+
+
+def route(message: MessageEvent) -> tuple:
+    """Return the ``(name, handler, slow_after, workload)`` branches for a message."""
+    key = message.route_key
+    branches = _routes.get(key)
+    if branches is None:
+        branches = tuple(
+            (name, handler, slow_after, workload)
+            for name, (handler, slow_after, workload, interest) in _subscriptions.items()
+            if _wants(interest, key)
+        )
+        _routes[key] = branches
+    return branches
+
+
+def _run_branch(name, handler, slow_after, message, say, client, context):
+    """Run one branch, keeping its errors away from the other branches."""
+    started = time.monotonic()
+    try:
+        with metrics.track("message_branch", name):
+            handler(message, say, client, context)
+    except Exception as e:
+        logger.error("Error in %s message handler: %s", name, e)
+    elapsed = time.monotonic() - started
+    if elapsed > slow_after:
+        logger.warning(
+            "%s message handler took %.1fs, over its %ss slow threshold", name, elapsed, slow_after
+        )
+
+
+def dispatch_message(event, say, client, context):
+    """Single consolidated message event handler that dispatches to all modules.
+
+    The event is classified once and only handed to the branches subscribed to
+    its class, each on its workload's pool. Nothing here waits on a branch, so
+    this runs in place and returns as soon as the branches are queued; a branch
+    whose pool is full is skipped for this message.
+    """
+    message = MessageEvent(event)
+    for name, handler, slow_after, workload in route(message):
         try:
-            miscellaneous.handle_message(event, say, client)
-        except Exception as e:
-            logger.error(f"Error in miscellaneous message handler: {e}")
+            executors.pool(workload).submit(
+                _run_branch, name, handler, slow_after, message, say, client, context
+            )
+        except executors.Busy:
+            logger.warning("%s pool is full, skipping %s message handler", workload, name)
+
+
+def register(app):
+    app.event("message", workload=None)(dispatch_message)
@@ -2,26 +2,26 @@ import logging
 import os
 import time
 
+from handlers import message_dispatcher
+
 logger = logging.getLogger(__name__)
 
 GITHUB_URL = "https://github.com/dragonsenseiguy/dragon-bot"
 PING_GROUP_ID = os.environ.get("PING_GROUP_ID")
 
 
-def handle_message(event, say, client):
+def handle_message(message, say, client, context=None):
     """Respond with :thread: when the ping group is mentioned."""
-    if not PING_GROUP_ID:
-        return
-
-    text = event.get("text", "")
-    if event.get("bot_id"):
-        return
-
-    if f"<!subteam^{PING_GROUP_ID}>" in text:
+    if f"<!subteam^{PING_GROUP_ID}>" in message.text:
         say(":thread:")
 
 
 def register(app):
+    if PING_GROUP_ID:
+        message_dispatcher.subscribe(
+            "miscellaneous", handle_message, kinds=("plain", "content")
+        )
+
     @app.command("/ping")
     def ping(ack, respond, command):
         start = time.time()
@@ -1,15 +1,101 @@
 import logging
 import os
+import threading
 
 WELCOME_CHANNEL = os.getenv("WELCOME_CHANNEL")
 NOTIFY_USER = "U09H4M0523Z"
 PING_GROUP = "S0A3L9DHB8F"
+# Joins within this many seconds of the first one share an update and a welcome.
+BATCH_SECONDS = float(os.getenv("WELCOME_BATCH_SECONDS", "2"))
 
 
 logger = logging.getLogger(__name__)
 
 
+class MembershipBatcher:
+    """Adds joiners to a user group and welcomes them, once per burst.
+
+    The first join starts a ``window``-second timer; every join until it fires is
+    written with a single ``usergroups.users.update`` and greeted in one message.
+    Flushes run one at a time and list the group's members right before their
+    update, so concurrent joins cannot overwrite each other's updates and members
+    who left since are not added back.
+    """
+
+    def __init__(self, usergroup: str, channel: str, window: float):
+        self.usergroup = usergroup
+        self.channel = channel
+        self.window = window
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # user_id -> inviter_id, in join order
+        self._pending: dict[str, str | None] = {}
+        self._timer = None
+        self._client = None
+
+    def add(self, client, user_id: str, inviter_id: str | None):
+        with self._lock:
+            self._client = client
+            self._pending.setdefault(user_id, inviter_id)
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            joined, self._pending = self._pending, {}
+            client, self._timer = self._client, None
+        if not joined:
+            return
+        with self._flush_lock:
+            self._add_to_group(client, list(joined))
+        self._welcome(client, joined)
+
+    def _add_to_group(self, client, users: list[str]):
+        try:
+            logger.debug(f"Fetching current users in ping group {self.usergroup}")
+            response = client.usergroups_users_list(usergroup=self.usergroup)
+            members = response.get("users", [])
+            present = set(members)
+            new = [user for user in users if user not in present]
+            if not new:
+                logger.debug(f"{len(users)} joined user(s) already in ping group")
+                return
+            client.usergroups_users_update(usergroup=self.usergroup, users=[*members, *new])
+            mentions = ", ".join(f"<@{user}>" for user in new)
+            logger.info(f"Added {mentions} to ping group {self.usergroup}")
+        except Exception as e:
+            logger.error(f"Failed to add {users} to ping group: {e}")
+
+    def _welcome(self, client, joined: dict[str, str | None]):
+        greetings = []
+        for user_id, inviter_id in joined.items():
+            inviter_mention = f" (added by <@{inviter_id}>)" if inviter_id else ""
+            greetings.append(f"<@{user_id}>{inviter_mention}")
+        if len(greetings) == 1:
+            added = "you have been added"
+        else:
+            greetings[-2:] = [f"{greetings[-2]} and {greetings[-1]}"]
+            added = "you have all been added"
+        logger.debug("Sending welcome message")
+        try:
+            client.chat_postMessage(
+                channel=self.channel,
+                text=(
+                    f"Welcome to Aditya tries to Code {', '.join(greetings)}, <@{NOTIFY_USER}> get in here. "
+                    f"Also btw {added} to the ping group aditya-squad, "
+                    "you can leave if you want to (I don't ping often)"
+                ),
+            )
+            logger.info(f"Welcome message sent for {len(joined)} user(s)")
+        except Exception as e:
+            logger.error(f"Failed to send welcome message: {e}")
+
+
 def register(app):
+    batcher = MembershipBatcher(PING_GROUP, WELCOME_CHANNEL, BATCH_SECONDS)
+
     @app.event("member_joined_channel")
     def handle_member_joined(event, say, client):
         channel_id = event.get("channel")
@@ -21,28 +107,4 @@ def register(app):
 
         inviter_id = event.get("inviter")
         logger.info(f"User <@{user_id}> joined welcome channel (invited by <@{inviter_id}>)")
-
-        try:
-            logger.debug(f"Fetching current users in ping group {PING_GROUP}")
-            current_users = client.usergroups_users_list(usergroup=PING_GROUP)
-            user_list = current_users.get("users", [])
-            if user_id not in user_list:
-                user_list.append(user_id)
-                client.usergroups_users_update(usergroup=PING_GROUP, users=user_list)
-                logger.info(f"Added <@{user_id}> to ping group {PING_GROUP}")
-            else:
-                logger.debug(f"User <@{user_id}> already in ping group")
-        except Exception as e:
-            logger.error(f"Failed to add user to ping group: {e}")
-
-        inviter_mention = f" (added by <@{inviter_id}>)" if inviter_id else ""
-        logger.debug("Sending welcome message")
-        client.chat_postMessage(
-            channel=channel_id,
-            text=(
-                f"Welcome to Aditya tries to Code <@{user_id}>{inviter_mention}, <@{NOTIFY_USER}> get in here. "
-                "Also btw you have been added to the ping group aditya-squad, "
-                "you can leave if you want to (I don't ping often)"
-            ),
-        )
-        logger.info(f"Welcome message sent for <@{user_id}>")
+        batcher.add(client, user_id, inviter_id)
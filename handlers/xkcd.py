@@ -1,13 +1,13 @@
 import logging
 from random import randint
 
-import requests
+from utils import http_client
 
 
 def fetch_xkcd(xkcd_id: str = None) -> dict:
     url = "https://xkcd.com/info.0.json" if xkcd_id is None else f"https://xkcd.com/{xkcd_id}/info.0.json"
     logging.debug(f"Fetching XKCD from: {url}")
-    resp = requests.get(url)
+    resp = http_client.client().get(url, "xkcd")
     resp.raise_for_status()
     logging.debug(f"XKCD API response status: {resp.status_code}")
     return resp.json()
@@ -46,7 +46,7 @@ def format_xkcd_blocks(info: dict) -> list:
 
 
 def register(app):
-    @app.command("/xkcd-fetch")
+    @app.command("/xkcd-fetch", workload="external")
     def xkcd_fetch(ack, command):
         ack()
         logging.info(f"/xkcd-fetch used by <@{command['user_id']}>")
@@ -72,7 +72,7 @@ def register(app):
                 text=":x: Could not retrieve XKCD comic.",
             )
 
-    @app.command("/xkcd-random")
+    @app.command("/xkcd-random", workload="external")
     def xkcd_random(ack, command):
         ack()
         logging.info(f"/xkcd-random used by <@{command['user_id']}>")
@@ -91,7 +91,7 @@ def register(app):
                 text=":x: Could not retrieve XKCD comic.",
             )
 
-    @app.command("/xkcd-latest")
+    @app.command("/xkcd-latest", workload="external")
     def xkcd_latest(ack, command):
         ack()
         logging.info(f"/xkcd-latest used by <@{command['user_id']}>")
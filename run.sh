@@ -1,7 +1,8 @@
 #!/bin/bash
 
-# Start the bot in the background
-nohup uv run app.py > bot.log 2> bot.err &
+# Start the bot in the background. Log lines go to slack.log only; bot.err
+# keeps anything printed before logging is set up, such as import errors.
+LOG_CONSOLE=0 nohup uv run app.py > /dev/null 2> bot.err &
 
 # Get the process ID of the last background command
 PID=$!
@@ -10,5 +11,5 @@ PID=$!
 echo $PID > bot.pid
 
 echo "Bot started in the background with PID: $PID"
-echo "Logs are being saved to bot.log and bot.err"
+echo "Logs are being saved to slack.log (startup errors in bot.err)"
 echo "To stop the bot, run: ./stop.sh"
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+
+from utils import metrics
+
+_MISSING = object()
+# Rough bytes a cached text costs on top of its characters (dict, tuple and str headers),
+# for caches budgeted in bytes.
+ENTRY_OVERHEAD = 200
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ``ttl`` seconds after being set.
+
+    Lookups, inserts and evictions are O(1) and the cache never holds more than
+    ``maxsize`` entries. With ``sizeof`` it also evicts down to ``maxbytes``,
+    counting ``sizeof(value)`` for each entry. Hits and misses are exported as
+    ``dragonbot_cache_requests_total{cache=name,result=hit|miss}``.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, maxbytes: int = 0, sizeof=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self._sizeof = sizeof
+        self.size = 0
+        self._lock = threading.Lock()
+        # key -> (expires_at, value, bytes), least recently used first
+        self._entries: OrderedDict = OrderedDict()
+
+    def _remove(self, key):
+        """Drop ``key`` and return its entry, or None. Caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+        return entry
+
+    def _lookup(self, key, now: float):
+        """Return the live value for ``key`` or ``_MISSING``. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        if entry[0] <= now:
+            self._remove(key)
+            return _MISSING
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key, value, now: float, ttl: float | None = None):
+        self._remove(key)
+        nbytes = self._sizeof(value) if self._sizeof else 0
+        self._entries[key] = (now + (self.ttl if ttl is None else ttl), value, nbytes)
+        self.size += nbytes
+        while len(self._entries) > self.maxsize or (
+            self._sizeof and self.size > self.maxbytes and self._entries
+        ):
+            self._remove(next(iter(self._entries)))
+
+    def _count(self, hit: bool):
+        metrics.inc("cache_requests_total", cache=self.name, result="hit" if hit else "miss")
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+        self._count(value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl: float | None = None):
+        """Store ``value``; ``ttl`` overrides the cache's lifetime for this entry."""
+        with self._lock:
+            self._store(key, value, time.monotonic(), ttl)
+
+    def add(self, key, value=True) -> bool:
+        """Insert ``key`` unless it is already live. Returns True if it was new."""
+        with self._lock:
+            now = time.monotonic()
+            new = self._lookup(key, now) is _MISSING
+            if new:
+                self._store(key, value, now)
+        self._count(not new)
+        return new
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._remove(key)
+        return default if entry is None else entry[1]
+
+    def items(self) -> list:
+        """Live ``(key, value)`` pairs, least recently used first."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                (key, value) for key, (expires, value, _) in self._entries.items() if expires > now
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,191 @@
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Idle connections unused for longer than this are checked with ``SELECT 1`` before reuse.
+HEALTH_CHECK_SECONDS = 30
+
+_TABLE_PATTERN = re.compile(
+    r"\b(?:FROM|INTO|UPDATE|TABLE(?:\s+IF\s+NOT\s+EXISTS)?)\s+(\w+)", re.IGNORECASE
+)
+
+
+@functools.lru_cache(maxsize=256)
+def query_name(query: str) -> str:
+    """Label a statement for metrics as ``VERB table``, e.g. ``SELECT user_xp``."""
+    verb = query.split(None, 1)[0].upper() if query.strip() else "?"
+    match = _TABLE_PATTERN.search(query)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+@functools.cache
+def _timed_cursor():
+    """Build the timed cursor class, importing psycopg2 only when first needed."""
+    import psycopg2.extensions
+
+    class TimedCursor(psycopg2.extensions.cursor):
+        """Cursor that records count, errors and latency for every statement."""
+
+        def execute(self, query, vars=None):
+            with metrics.track("db", query_name(query)):
+                return super().execute(query, vars)
+
+        def executemany(self, query, vars_list):
+            with metrics.track("db", query_name(query)):
+                return super().executemany(query, vars_list)
+
+    return TimedCursor
+
+
+def connect(dsn: str | None = None):
+    """Open a Postgres connection whose cursors are timed.
+
+    ``DB_CONNECT_TIMEOUT`` (seconds) bounds the handshake and ``DB_STATEMENT_TIMEOUT``
+    (milliseconds, ``0`` for none) every statement, so a stuck database fails calls
+    instead of hanging the threads that make them.
+    """
+    import psycopg2
+
+    return psycopg2.connect(
+        dsn or os.getenv("DATABASE_URL"),
+        cursor_factory=_timed_cursor(),
+        connect_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", "5")),
+        options=f"-c statement_timeout={int(os.getenv('DB_STATEMENT_TIMEOUT', '10000'))}",
+    )
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the pool's ``timeout``."""
+
+
+class Pool:
+    """Thread-safe pool of up to ``maxsize`` connections opened with ``connect``.
+
+    Callers wait up to ``timeout`` seconds for a free connection. Connections go
+    back rolled back and are reused most-recently-used first; one left broken is
+    discarded, and one idle for over ``HEALTH_CHECK_SECONDS`` is pinged before reuse.
+    A forked worker drops the connections it inherited and opens its own.
+    """
+
+    def __init__(self, maxsize: int, timeout: float):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        # (connection, time it was returned), most recently returned last
+        self._idle: list = []
+        self._size = 0
+        self._pid = os.getpid()
+
+    def _open(self):
+        try:
+            with metrics.track("db", "connect"):
+                return connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _healthy(self, conn, idle_since: float) -> bool:
+        if getattr(conn, "closed", 0):
+            return False
+        if time.monotonic() - idle_since < HEALTH_CHECK_SECONDS:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding stale database connection: {e}")
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        metrics.gauge("db_pool_connections", -1, state="in_use")
+
+    def acquire(self):
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            if self._pid != os.getpid():
+                # Inherited sockets belong to the parent; closing them would end its sessions.
+                self._pid, self._idle, self._size = os.getpid(), [], 0
+            if not self._idle and self._size >= self.maxsize:
+                metrics.inc("db_pool_exhausted_total")
+            while not self._idle and self._size >= self.maxsize:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    metrics.inc("db_pool_timeouts_total")
+                    raise PoolTimeout(f"No database connection free within {self.timeout:g}s")
+            if self._idle:
+                conn, idle_since = self._idle.pop()
+                metrics.gauge("db_pool_connections", -1, state="idle")
+            else:
+                conn, idle_since = None, 0.0
+                self._size += 1
+        metrics.gauge("db_pool_connections", 1, state="in_use")
+        if conn is not None and not self._healthy(conn, idle_since):
+            self._discard(conn)
+            return self.acquire()
+        if conn is None:
+            try:
+                conn = self._open()
+            except BaseException:
+                metrics.gauge("db_pool_connections", -1, state="in_use")
+                raise
+        metrics.observe("db_pool_wait", "acquire", time.perf_counter() - started)
+        return conn
+
+    def release(self, conn):
+        """Return ``conn``; any open transaction is rolled back first."""
+        try:
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        if getattr(conn, "closed", 0):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        metrics.gauge("db_pool_connections", -1, state="in_use")
+        metrics.gauge("db_pool_connections", 1, state="idle")
+
+
+@functools.cache
+def pool() -> Pool:
+    """The process-wide pool, sized by ``DB_POOL_SIZE`` and waited on for ``DB_POOL_TIMEOUT``."""
+    return Pool(
+        maxsize=int(os.getenv("DB_POOL_SIZE", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+    )
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection for the block; commit inside it to keep changes.
+
+    The pool blocks, so async code should enter this from a worker thread (the
+    ``db`` workload already runs there).
+    """
+    conn = pool().acquire()
+    try:
+        yield conn
+    finally:
+        pool().release(conn)
@@ -0,0 +1,61 @@
+import functools
+import logging
+import os
+
+from slack_bolt import BoltResponse
+
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def dedup_key(body: dict) -> str | None:
+    """Identify a delivery so a redelivery of it maps to the same key.
+
+    Events carry a stable ``event_id`` across Slack's retries; commands and
+    interactions carry a ``trigger_id`` that is unique per user action.
+    Returns None for payloads that cannot be identified, which are never dropped.
+    """
+    if body.get("event_id"):
+        return f"event:{body['event_id']}"
+    event = body.get("event")
+    if event and event.get("client_msg_id"):
+        return f"{event.get('type')}:{event['client_msg_id']}"
+    if body.get("trigger_id"):
+        return f"trigger:{body['trigger_id']}"
+    actions = body.get("actions")
+    if actions and actions[0].get("action_ts"):
+        return f"action:{actions[0]['action_ts']}:{actions[0].get('action_id')}"
+    return None
+
+
+@functools.cache
+def seen() -> TTLCache:
+    """The process-wide cache of recent delivery keys."""
+    return TTLCache(
+        "dedup",
+        maxsize=int(os.getenv("DEDUP_SIZE", "10000")),
+        ttl=float(os.getenv("DEDUP_TTL", "600")),
+    )
+
+
+def _is_duplicate(body: dict) -> bool:
+    key = dedup_key(body)
+    if key is None or seen().add(key):
+        return False
+    logger.info("Dropping redelivered request %s", key)
+    return True
+
+
+def middleware(body, next):
+    """Global middleware: ack redeliveries without running any listener."""
+    if _is_duplicate(body):
+        return BoltResponse(status=200, body="")
+    return next()
+
+
+async def async_middleware(body, next):
+    """``middleware`` for ``AsyncApp``."""
+    if _is_duplicate(body):
+        return BoltResponse(status=200, body="")
+    return await next()
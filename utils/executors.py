@@ -0,0 +1,90 @@
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# workload -> (threads, queued tasks allowed beyond them)
+POOLS = {
+    "ai": (4, 8),  # AI completions and image generation, seconds each
+    "external": (8, 32),  # quote/joke/animal/xkcd APIs
+    "fun": (4, 64),  # trigger-word replies and emoji reactions to messages
+    "tools": (8, 16),  # tool calls an AI reply is waiting on, e.g. web searches
+    "db": (4, 64),  # Postgres reads and writes
+    "instant": (8, 64),  # replies that only talk to Slack
+    "xp": (2, 512),  # XP awards: a cooldown claim and an in-memory increment
+}
+
+
+class Busy(Exception):
+    """Raised by ``submit`` when a pool's queue is full."""
+
+
+class BoundedExecutor:
+    """Thread pool that refuses work instead of queueing more than ``queue`` tasks."""
+
+    def __init__(self, name: str, workers: int, queue: int):
+        self.name = name
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=f"pool-{name}"
+        )
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        """Tasks queued or running."""
+        return self._pending
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _run(self, submitted, fn, args, kwargs):
+        metrics.observe("pool_wait", self.name, time.perf_counter() - submitted)
+        return fn(*args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule ``fn``. Raises ``Busy`` rather than waiting for a free slot."""
+        if not self._slots.acquire(blocking=False):
+            metrics.inc("pool_rejected_total", pool=self.name)
+            raise Busy(self.name)
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(
+                self._run, time.perf_counter(), fn, args, kwargs
+            )
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+
+def _sizes() -> dict:
+    """``POOLS`` with overrides from ``WORKLOAD_POOLS``, e.g. ``ai=2/4,db=8/128``."""
+    sizes = dict(POOLS)
+    for spec in filter(None, os.getenv("WORKLOAD_POOLS", "").split(",")):
+        name, _, size = spec.strip().partition("=")
+        workers, _, queue = size.partition("/")
+        sizes[name] = (int(workers), int(queue or 0))
+    return sizes
+
+
+@functools.cache
+def pool(workload: str) -> BoundedExecutor:
+    """The shared executor for ``workload``, one of ``POOLS``."""
+    sizes = _sizes()
+    if workload not in sizes:
+        raise ValueError(f"Unknown workload {workload!r}, expected one of {tuple(sizes)}")
+    workers, queue = sizes[workload]
+    logger.info(f"Starting {workload} pool: {workers} threads, {queue} queued")
+    return BoundedExecutor(workload, workers, queue)
@@ -0,0 +1,218 @@
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth another try: rate limited, or the upstream is briefly unavailable.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Methods safe to send twice. Others are retried only when the server cannot have
+# acted on them: the connection never opened, or it answered 429.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Longest Retry-After honoured before a retry; longer asks fail the call instead.
+MAX_RETRY_AFTER = 10.0
+
+
+class HostBusy(Exception):
+    """Raised when a host's concurrency limit stays full for the whole connect timeout."""
+
+
+class Client:
+    """Outbound HTTP shared by every handler.
+
+    One ``requests`` session keeps a keep-alive pool per host, so repeat calls skip
+    the TCP and TLS handshakes. At most ``per_host`` calls to a host run at once;
+    more wait for a slot, up to the connect timeout. Every call has a connect and
+    a read timeout, and failed calls are retried up to ``retries`` times after a
+    jittered exponential backoff. A forked worker builds its own session.
+
+    With ``redirect`` every call to another host is sent to ``<redirect>/<host>/<path>``
+    instead, so a local stand-in can answer for all of them.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float,
+        read_timeout: float,
+        retries: int,
+        backoff: float,
+        per_host: int,
+        redirect: str | None = None,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.redirect = redirect.rstrip("/") if redirect else None
+        self.retries = retries
+        self.backoff = backoff
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+        self._session = None
+        self._pid = None
+
+    def session(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Sockets inherited over a fork are shared with the parent.
+                self._session, self._pid = self._new_session(), os.getpid()
+            return self._session
+
+    def _new_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        # Connections kept per host match the calls allowed per host, so none are dropped.
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.per_host)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._slots.get(host)
+            if slot is None:
+                slot = self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    @contextmanager
+    def _host(self, host: str, name: str):
+        slot = self._slot(host)
+        started = time.perf_counter()
+        if not slot.acquire(timeout=self.timeout[0]):
+            metrics.inc("http_host_busy_total", host=host)
+            raise HostBusy(f"{host} already has {self.per_host} calls in flight")
+        metrics.observe("http_host_wait", name, time.perf_counter() - started)
+        metrics.gauge("http_in_flight", 1, host=host)
+        try:
+            yield
+        finally:
+            metrics.gauge("http_in_flight", -1, host=host)
+            slot.release()
+
+    def _delay(self, attempt: int, response) -> float | None:
+        """Seconds to wait before retry ``attempt``, or None if the server asked for too long."""
+        retry_after = (
+            response.headers.get("Retry-After") if response is not None else None
+        )
+        if retry_after:
+            try:
+                seconds = float(retry_after)
+            except ValueError:
+                seconds = 0.0
+            if seconds > MAX_RETRY_AFTER:
+                return None
+            if seconds > 0:
+                return seconds
+        # Full jitter keeps callers that failed together from retrying together.
+        return random.uniform(0, self.backoff * 2**attempt)
+
+    def _send(self, method: str, url: str, name: str, kwargs: dict):
+        """Send with retries; the response of the last attempt is returned unread."""
+        import requests
+
+        read_timeout = kwargs.pop("read_timeout", self.timeout[1])
+        kwargs.setdefault("timeout", (self.timeout[0], read_timeout))
+        idempotent = method in IDEMPOTENT_METHODS
+        session = self.session()
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+                if not retryable or attempt == self.retries:
+                    raise
+                reason = type(e).__name__
+            else:
+                status = response.status_code
+                retryable = status == 429 or (idempotent and status in RETRY_STATUSES)
+                if not retryable or attempt == self.retries:
+                    return response
+                reason = str(status)
+            delay = self._delay(attempt, response)
+            if delay is None:
+                return response
+            if response is not None:
+                response.close()
+            metrics.inc("http_retries_total", name=name)
+            logger.warning(
+                "%s %s failed (%s), retry %d in %.2fs",
+                method,
+                name,
+                reason,
+                attempt + 1,
+                delay,
+            )
+            time.sleep(delay)
+
+    def _url(self, url: str) -> str:
+        """``url``, rewritten onto ``redirect`` unless it already points at that host."""
+        if not self.redirect:
+            return url
+        parts = urlsplit(url)
+        if parts.netloc == urlsplit(self.redirect).netloc:
+            return url
+        url = f"{self.redirect}/{parts.netloc}{parts.path or '/'}"
+        return f"{url}?{parts.query}" if parts.query else url
+
+    @contextmanager
+    def _call(self, method: str, url: str, name: str, kwargs: dict):
+        """Hold a slot on the host for the call and time it; 4xx and 5xx answers count as errors."""
+        url = self._url(url)
+        started = time.perf_counter()
+        failed = True
+        try:
+            with self._host(urlsplit(url).netloc, name):
+                response = self._send(method.upper(), url, name, kwargs)
+                try:
+                    yield response
+                finally:
+                    response.close()
+            failed = not response.ok
+        finally:
+            metrics.observe("http", name, time.perf_counter() - started, error=failed)
+
+    def request(self, method: str, url: str, name: str, **kwargs):
+        """Send a request and return the response with its body read.
+
+        ``name`` labels the call's ``http`` metrics. Other arguments go to
+        ``requests.Session.request``; ``read_timeout`` or ``timeout`` overrides the
+        defaults for this call.
+        """
+        with self._call(method, url, name, dict(kwargs, stream=False)) as response:
+            return response
+
+    @contextmanager
+    def stream(self, method: str, url: str, name: str, **kwargs):
+        """Like ``request``, but the body is read inside the block as it arrives.
+
+        The host slot, the timing and the connection are held until the block exits.
+        """
+        with self._call(method, url, name, dict(kwargs, stream=True)) as response:
+            yield response
+
+    def get(self, url: str, name: str, **kwargs):
+        return self.request("GET", url, name, **kwargs)
+
+    def post(self, url: str, name: str, **kwargs):
+        return self.request("POST", url, name, **kwargs)
+
+
+@functools.cache
+def client() -> Client:
+    """The process-wide client, configured from the environment on first use."""
+    return Client(
+        connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+        read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+        retries=int(os.getenv("HTTP_RETRIES", "2")),
+        backoff=float(os.getenv("HTTP_RETRY_BACKOFF", "0.5")),
+        per_host=int(os.getenv("HTTP_MAX_PER_HOST", "8")),
+        redirect=os.getenv("HTTP_REDIRECT_URL"),
+    )
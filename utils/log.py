@@ -0,0 +1,98 @@
+import atexit
+import itertools
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+
+from utils import metrics
+
+FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+QUEUE_SIZE = 10000
+
+# Loggers for lines written once per message; only 1 in N of their records below
+# WARNING are kept. Override with LOG_SAMPLE, e.g. "handlers.fun.messages=100".
+DEFAULT_SAMPLE = "handlers.fun.messages=10"
+
+
+class SampleFilter(logging.Filter):
+    """Keep 1 in N records below WARNING from the configured loggers (and their children)."""
+
+    def __init__(self, rates: dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self._counters = {name: itertools.count() for name in rates}
+
+    def _rate_for(self, name: str):
+        while name:
+            if name in self.rates:
+                return name
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        name = self._rate_for(record.name)
+        if name is None:
+            return True
+        return next(self._counters[name]) % self.rates[name] == 0
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """``QueueHandler`` that drops records when the queue is full instead of blocking."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_dropped_total")
+
+
+def _sample_rates() -> dict[str, int]:
+    rates = {}
+    for spec in filter(None, os.getenv("LOG_SAMPLE", DEFAULT_SAMPLE).split(",")):
+        name, _, rate = spec.strip().partition("=")
+        if int(rate) > 1:
+            rates[name] = int(rate)
+    return rates
+
+
+def setup(path: str = "slack.log", processes: int = 1) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a background writer thread.
+
+    Records are formatted and written to a size-rotated ``path`` (and stderr
+    unless ``LOG_CONSOLE=0``) on the listener thread, so logging never waits on
+    disk. With ``processes > 1`` the queue is shared with forked workers, so this
+    process stays the only writer of the log file.
+    """
+    if processes > 1:
+        log_queue = multiprocessing.get_context("fork").Queue(QUEUE_SIZE)
+    else:
+        log_queue = queue.Queue(QUEUE_SIZE)
+
+    formatter = logging.Formatter(FORMAT)
+    handlers = [
+        logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv("LOG_BACKUPS", "5")),
+            encoding="utf-8",
+        )
+    ]
+    if os.getenv("LOG_CONSOLE", "1") != "0":
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SampleFilter(_sample_rates()))
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
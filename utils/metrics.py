@@ -0,0 +1,146 @@
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "dragonbot"
+
+# Upper bounds in seconds, from a Slack reaction up to a slow AI completion.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_lock = threading.Lock()
+# (kind, name) -> [calls, errors, sum of seconds, per-bucket counts (last is +Inf)]
+_series: dict[tuple[str, str], list] = {}
+# (metric, sorted label items) -> value
+_counters: dict[tuple[str, tuple], float] = {}
+_gauges: dict[tuple[str, tuple], float] = {}
+
+
+def observe(kind: str, name: str, seconds: float, error: bool = False):
+    """Record one call of ``name`` (e.g. ``/ping``) in category ``kind`` (e.g. ``command``)."""
+    bucket = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        series = _series.get((kind, name))
+        if series is None:
+            series = _series[(kind, name)] = [0, 0, 0.0, [0] * (len(BUCKETS) + 1)]
+        series[0] += 1
+        if error:
+            series[1] += 1
+        series[2] += seconds
+        series[3][bucket] += 1
+
+
+def inc(metric: str, amount: float = 1, **labels):
+    """Add ``amount`` to counter ``metric``, e.g. ``inc("cache_requests_total", cache="dedup")``."""
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def gauge(metric: str, amount: float, **labels):
+    """Add ``amount`` (negative to lower it) to gauge ``metric``, e.g. a queue depth."""
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + amount
+
+
+@contextmanager
+def track(kind: str, name: str):
+    """Time the enclosed block; an exception counts as an error and is re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe(kind, name, time.perf_counter() - started, error=True)
+        raise
+    observe(kind, name, time.perf_counter() - started)
+
+
+def instrument(kind: str, name: str, func):
+    """Wrap a listener so every call is recorded. Bolt still sees the original signature."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with track(kind, name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(items) -> str:
+    return ",".join(f'{key}="{_escape(str(value))}"' for key, value in items)
+
+
+def render() -> str:
+    """Render every series in the Prometheus text exposition format."""
+    with _lock:
+        snapshot = [
+            (kind, name, calls, errors, total, list(buckets))
+            for (kind, name), (calls, errors, total, buckets) in sorted(_series.items())
+        ]
+        counters = sorted(_counters.items())
+        gauges = sorted(_gauges.items())
+
+    calls_lines = [f"# TYPE {PREFIX}_calls_total counter"]
+    errors_lines = [f"# TYPE {PREFIX}_errors_total counter"]
+    latency_lines = [f"# TYPE {PREFIX}_latency_seconds histogram"]
+    for kind, name, calls, errors, total, buckets in snapshot:
+        labels = f'kind="{_escape(kind)}",name="{_escape(name)}"'
+        calls_lines.append(f"{PREFIX}_calls_total{{{labels}}} {calls}")
+        errors_lines.append(f"{PREFIX}_errors_total{{{labels}}} {errors}")
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), buckets):
+            cumulative += count
+            latency_lines.append(
+                f'{PREFIX}_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+            )
+        latency_lines.append(f"{PREFIX}_latency_seconds_sum{{{labels}}} {total}")
+        latency_lines.append(f"{PREFIX}_latency_seconds_count{{{labels}}} {calls}")
+
+    counter_lines = []
+    seen = set()
+    for metric_type, values in (("counter", counters), ("gauge", gauges)):
+        for (metric, items), value in values:
+            if metric not in seen:
+                seen.add(metric)
+                counter_lines.append(f"# TYPE {PREFIX}_{metric} {metric_type}")
+            counter_lines.append(f"{PREFIX}_{metric}{{{_labels(items)}}} {value}")
+    return "\n".join(calls_lines + errors_lines + latency_lines + counter_lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(host: str | None = None, port: int | None = None):
+    """Serve ``/metrics`` on a background thread. ``METRICS_PORT=0`` disables it."""
+    host = host or os.getenv("METRICS_HOST", "127.0.0.1")
+    port = int(os.getenv("METRICS_PORT", "9100")) if port is None else port
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Metrics available at http://{host}:{port}/metrics")
+    return server
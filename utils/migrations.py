@@ -0,0 +1,154 @@
+import logging
+import os
+import threading
+
+from utils import db
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent starts migrate one at a time.
+LOCK_ID = 0x64726167
+
+# (version, description, statement). Append only: never edit or reorder an entry
+# that has shipped. Every statement must be safe to run against a database that
+# predates versioning, hence IF NOT EXISTS throughout.
+MIGRATIONS = [
+    (
+        1,
+        "ai_usage table",
+        """
+        CREATE TABLE IF NOT EXISTS ai_usage (
+            usage_date DATE PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    ),
+    (
+        2,
+        "user_xp table",
+        """
+        CREATE TABLE IF NOT EXISTS user_xp (
+            user_id TEXT PRIMARY KEY,
+            xp INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    ),
+    (
+        3,
+        "join_manager_config table",
+        """
+        CREATE TABLE IF NOT EXISTS join_manager_config (
+            channel_id TEXT PRIMARY KEY,
+            enabled BOOLEAN NOT NULL DEFAULT TRUE,
+            log_channel TEXT,
+            questions JSONB DEFAULT '[]',
+            ban_list JSONB DEFAULT '[]'
+        )
+        """,
+    ),
+    (
+        4,
+        "user_xp index on xp for /leaderboard",
+        "CREATE INDEX IF NOT EXISTS user_xp_xp_idx ON user_xp (xp DESC)",
+    ),
+    (
+        5,
+        "join_manager_config index on enabled configs",
+        """
+        CREATE INDEX IF NOT EXISTS join_manager_config_enabled_idx
+            ON join_manager_config (channel_id) WHERE enabled
+        """,
+    ),
+    (
+        6,
+        "user_xp index on (xp, user_id) for keyset /leaderboard pages",
+        "CREATE INDEX IF NOT EXISTS user_xp_xp_user_id_idx ON user_xp (xp DESC, user_id DESC)",
+    ),
+    (
+        7,
+        "drop user_xp_xp_idx, superseded by user_xp_xp_user_id_idx",
+        "DROP INDEX IF EXISTS user_xp_xp_idx",
+    ),
+    (
+        8,
+        "ai_response_cache table",
+        """
+        CREATE TABLE IF NOT EXISTS ai_response_cache (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+    ),
+    (
+        9,
+        "ai_response_cache index on created_at for expiry",
+        """
+        CREATE INDEX IF NOT EXISTS ai_response_cache_created_at_idx
+            ON ai_response_cache (created_at)
+        """,
+    ),
+]
+
+
+def _current_version(conn) -> int:
+    """Return the applied schema version, or 0 before versioning existed."""
+    import psycopg2.errors
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            return cur.fetchone()[0]
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        return 0
+
+
+def migrate():
+    """Apply pending migrations. On an up-to-date database this is one query."""
+    if not os.getenv("DATABASE_URL"):
+        return
+    latest = MIGRATIONS[-1][0]
+    try:
+        conn = db.connect()
+        try:
+            if _current_version(conn) >= latest:
+                conn.rollback()
+                logger.info(f"Database schema is up to date (version {latest})")
+                return
+
+            with conn.cursor() as cur:
+                # Waiting on the lock or building an index may outlast DB_STATEMENT_TIMEOUT.
+                cur.execute("SET LOCAL statement_timeout = 0")
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_ID,))
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        description TEXT NOT NULL,
+                        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    )
+                """)
+                # Re-read under the lock in case another process just migrated.
+                cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                current = cur.fetchone()[0]
+                for version, description, statement in MIGRATIONS:
+                    if version <= current:
+                        continue
+                    cur.execute(statement)
+                    cur.execute(
+                        "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                        (version, description),
+                    )
+                    logger.info(f"Applied migration {version}: {description}")
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"Failed to migrate database: {e}")
+
+
+def migrate_in_background() -> threading.Thread:
+    """Start ``migrate`` on a thread so it overlaps opening Socket Mode."""
+    thread = threading.Thread(target=migrate, name="db-migrate", daemon=True)
+    thread.start()
+    return thread
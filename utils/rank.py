@@ -0,0 +1,100 @@
+from array import array
+
+INITIAL_BUCKETS = 1024
+
+
+class RankIndex:
+    """Counts scores in a Fenwick tree so the rank of any score takes O(log n).
+
+    Scores are counted in buckets of ``unit``, so ranks are exact when every score
+    is a multiple of it. The tree doubles as higher scores arrive, up to
+    ``max_buckets`` (a power of two, 8 bytes each); scores beyond that share the
+    top bucket. Scores of zero or less are not ranked.
+    """
+
+    def __init__(self, unit: int = 1, max_buckets: int = 1 << 20):
+        self.unit = unit
+        self.max_buckets = max_buckets
+        self.total = 0
+        self._tree = self._zeros(min(INITIAL_BUCKETS, max_buckets))
+
+    @staticmethod
+    def _zeros(buckets: int) -> array:
+        # 1-based: slot 0 is unused.
+        return array("q", bytes(8 * (buckets + 1)))
+
+    @property
+    def capacity(self) -> int:
+        return len(self._tree) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._tree) * self._tree.itemsize
+
+    def _bucket(self, score: int) -> int:
+        return min(-(-score // self.unit), self.max_buckets)
+
+    def _grow(self, bucket: int):
+        while self.capacity < bucket:
+            # The new top slot covers every bucket; the others cover only new, empty ones.
+            capacity = self.capacity
+            self._tree.extend(self._zeros(capacity - 1))
+            self._tree[2 * capacity] = self.total
+
+    def _prefix(self, bucket: int) -> int:
+        """Scores in buckets ``1..bucket``."""
+        tree = self._tree
+        count = 0
+        while bucket > 0:
+            count += tree[bucket]
+            bucket &= bucket - 1
+        return count
+
+    def add(self, score: int, count: int = 1):
+        """Count ``score`` ``count`` more times (negative to remove it)."""
+        if score <= 0:
+            return
+        bucket = self._bucket(score)
+        self._grow(bucket)
+        tree, capacity = self._tree, self.capacity
+        while bucket <= capacity:
+            tree[bucket] += count
+            bucket += bucket & -bucket
+        self.total += count
+
+    def move(self, old: int, new: int):
+        """Replace one ``old`` score with ``new``."""
+        if old != new:
+            self.add(old, -1)
+            self.add(new)
+
+    def load(self, scores):
+        """Replace the contents with ``scores`` in O(n + buckets)."""
+        buckets = [self._bucket(score) for score in scores if score > 0]
+        capacity = min(INITIAL_BUCKETS, self.max_buckets)
+        top = max(buckets, default=0)
+        while capacity < top:
+            capacity *= 2
+        tree = self._zeros(capacity)
+        for bucket in buckets:
+            tree[bucket] += 1
+        for bucket in range(1, capacity + 1):
+            parent = bucket + (bucket & -bucket)
+            if parent <= capacity:
+                tree[parent] += tree[bucket]
+        self._tree = tree
+        self.total = len(buckets)
+
+    def above(self, score: int) -> int:
+        """How many counted scores are higher than ``score``."""
+        if score <= 0:
+            return self.total
+        bucket = self._bucket(score)
+        return self.total - self._prefix(min(bucket, self.capacity))
+
+    def rank(self, score: int) -> int:
+        """1-based standard competition rank: equal scores share a rank."""
+        return self.above(score) + 1
+
+    def __len__(self) -> int:
+        return self.total
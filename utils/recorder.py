@@ -0,0 +1,43 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+@functools.cache
+def _file():
+    path = os.environ["RECORD_EVENTS"]
+    logger.info(f"Recording Socket Mode payloads to {path}")
+    return open(path, "a", buffering=1, encoding="utf-8")
+
+
+def record(body: dict):
+    """Append one payload as a JSON line, minus the verification token."""
+    line = json.dumps(
+        {"t": time.time(), "body": {k: v for k, v in body.items() if k != "token"}}
+    )
+    with _lock:
+        _file().write(line + "\n")
+
+
+def enabled() -> bool:
+    """Recording is on when ``RECORD_EVENTS`` names a JSONL file."""
+    return bool(os.getenv("RECORD_EVENTS"))
+
+
+def middleware(body, next):
+    """Global middleware that records every payload before it is handled."""
+    record(body)
+    return next()
+
+
+async def async_middleware(body, next):
+    """``middleware`` for ``AsyncApp``."""
+    record(body)
+    return await next()
@@ -0,0 +1,133 @@
+import functools
+import hashlib
+import logging
+import os
+import re
+
+from utils import db, metrics
+from utils.cache import ENTRY_OVERHEAD, TTLCache
+
+logger = logging.getLogger(__name__)
+
+# User, channel and group mentions, plus <!here>-style specials.
+MENTION_PATTERN = re.compile(r"<[@#!][^>]*>")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(prompt: str) -> str:
+    """``prompt`` without mentions, case or runs of whitespace.
+
+    Prompts that differ only in those share a cache entry.
+    """
+    return WHITESPACE.sub(" ", MENTION_PATTERN.sub(" ", prompt)).strip().casefold()
+
+
+def key(model: str, system: str, prompt: str) -> str:
+    """Cache key for a completion of ``prompt`` by ``model`` under ``system``."""
+    parts = (model, system, normalize(prompt))
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class ResponseCache:
+    """AI replies by prompt ``key``, LRU-evicted to ``max_bytes`` and expiring after ``ttl``.
+
+    With ``persist`` a miss falls back to the ``ai_response_cache`` table and
+    every stored reply is written there too, so answers outlive a restart and are
+    shared by worker processes. Lookups are counted as
+    ``dragonbot_cache_requests_total{cache="ai_response"}``, and as
+    ``cache="ai_response_db"`` for those that reach Postgres.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, persist: bool = False):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.persist = persist
+        # Every entry costs at least ENTRY_OVERHEAD, so the byte budget binds first.
+        self._entries = TTLCache(
+            "ai_response",
+            maxsize=max(1, max_bytes // ENTRY_OVERHEAD),
+            ttl=ttl,
+            maxbytes=max_bytes,
+            sizeof=lambda text: len(text) + ENTRY_OVERHEAD,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_bytes > 0
+
+    @property
+    def size(self) -> int:
+        return self._entries.size
+
+    def _load(self, key: str) -> str | None:
+        """The stored reply for ``key`` if Postgres has a live one."""
+        try:
+            with db.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """SELECT response, EXTRACT(EPOCH FROM now() - created_at)
+                           FROM ai_response_cache WHERE key = %s""",
+                        (key,),
+                    )
+                    row = cur.fetchone()
+        except Exception as e:
+            logger.warning(f"Could not read the AI response cache: {e}")
+            return None
+        if row is None or row[1] >= self.ttl:
+            return None
+        self._entries.set(key, row[0], ttl=self.ttl - float(row[1]))
+        return row[0]
+
+    def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+        text = self._entries.get(key)
+        if text is not None:
+            return text
+        if not self.persist:
+            return None
+        text = self._load(key)
+        metrics.inc(
+            "cache_requests_total",
+            cache="ai_response_db",
+            result="miss" if text is None else "hit",
+        )
+        return text
+
+    def set(self, key: str, text: str):
+        if not self.enabled:
+            return
+        self._entries.set(key, text)
+        if not self.persist:
+            return
+        try:
+            with db.connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        """INSERT INTO ai_response_cache (key, response) VALUES (%s, %s)
+                           ON CONFLICT (key) DO UPDATE
+                           SET response = EXCLUDED.response, created_at = now()""",
+                        (key, text),
+                    )
+                    cur.execute(
+                        """DELETE FROM ai_response_cache
+                           WHERE created_at < now() - make_interval(secs => %s)""",
+                        (self.ttl,),
+                    )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not write the AI response cache: {e}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@functools.cache
+def cache() -> ResponseCache:
+    """The process-wide AI response cache, configured from ``AI_CACHE_*``."""
+    return ResponseCache(
+        max_bytes=int(os.getenv("AI_CACHE_BYTES", str(4 * 1024 * 1024))),
+        ttl=float(os.getenv("AI_CACHE_TTL", str(6 * 3600))),
+        persist=os.getenv("AI_CACHE_PERSIST", "0") != "0"
+        and bool(os.getenv("DATABASE_URL")),
+    )
@@ -0,0 +1,287 @@
+import asyncio
+import functools
+import inspect
+import logging
+import os
+
+from slack_bolt import App, Args, Assistant, Respond, Say, SetStatus
+from slack_bolt.context.set_suggested_prompts import SetSuggestedPrompts
+from slack_bolt.util.utils import get_arg_names_of_callable
+
+from utils import dedup, executors, metrics, recorder
+from utils.slack_client import BotWebClient, api_url_kwargs
+
+logger = logging.getLogger(__name__)
+
+RUNTIMES = ("sync", "async")
+
+BUSY_TEXT = ":hourglass: Dragon Bot is busy right now, please try again in a moment."
+
+
+def _noop_ack(*args, **kwargs):
+    """Stand-in for ``ack`` once the adapter has already acknowledged the request."""
+
+
+def _instrumented(kind: str, name, register):
+    """Decorator that registers ``func`` with ``register`` wrapped in metrics."""
+
+    def decorator(func):
+        register(metrics.instrument(kind, str(name), func))
+        return func
+
+    return decorator
+
+
+def _arg_names(func):
+    """Arguments ``func`` asks for, or None if it takes ``**kwargs`` (gets everything)."""
+    if inspect.getfullargspec(inspect.unwrap(func)).varkw:
+        return None
+    return get_arg_names_of_callable(func)
+
+
+def _shed(workload: str, name: str, response_url: str | None) -> bool:
+    """Log a request dropped because its pool is full; True if the user should be told."""
+    logger.warning("%s pool is full, shedding %s", workload, name)
+    return bool(response_url)
+
+
+def _offloaded(name: str, workload: str | None, func):
+    """Sync listener that acks, then runs ``func`` on the ``workload`` pool.
+
+    ``workload=None`` runs ``func`` in place, for listeners that only hand work on.
+    """
+    if workload is None:
+        return func
+    arg_names = _arg_names(func)
+
+    @functools.wraps(func)
+    def listener(args: Args):
+        args.ack()
+        available = dict(vars(args), ack=_noop_ack)
+        if arg_names is not None:
+            available = {arg: available.get(arg) for arg in arg_names}
+        try:
+            executors.pool(workload).submit(func, **available)
+        except executors.Busy:
+            if _shed(workload, name, args.context.response_url):
+                args.respond(text=BUSY_TEXT, response_type="ephemeral")
+
+    # Bolt must inject ``args`` into the wrapper, not the arguments of ``func``.
+    del listener.__wrapped__
+    return listener
+
+
+class BotApp(App):
+    """``App`` that records every listener and runs it on its workload's pool.
+
+    Registration methods take ``workload``, one of ``executors.POOLS`` (default
+    ``instant``), so slow listeners cannot starve fast ones of threads.
+    """
+
+    def _init_context(self, req):
+        # Bolt builds a plain ``WebClient`` per request and binds ``say`` and the
+        # assistant helpers to it before any of our middleware runs; hand every
+        # request the app's ``BotWebClient`` so all calls are paced and recorded.
+        super()._init_context(req)
+        req.context["client"] = self.client
+
+    def _decorator(self, kind, name, workload, register):
+        return _instrumented(
+            kind, name, lambda func: register(_offloaded(str(name), workload, func))
+        )
+
+    def command(self, command, *args, workload="instant", **kwargs):
+        return self._decorator(
+            "command", command, workload, super().command(command, *args, **kwargs)
+        )
+
+    def event(self, event, *args, workload="instant", **kwargs):
+        return self._decorator(
+            "event", event, workload, super().event(event, *args, **kwargs)
+        )
+
+    def action(self, constraints, *args, workload="instant", **kwargs):
+        return self._decorator(
+            "action", constraints, workload, super().action(constraints, *args, **kwargs)
+        )
+
+    def view(self, constraints, *args, workload="instant", **kwargs):
+        return self._decorator(
+            "view", constraints, workload, super().view(constraints, *args, **kwargs)
+        )
+
+
+class AsyncAppAdapter:
+    """Expose the sync ``App`` registration API on top of ``AsyncApp``.
+
+    Handler modules are written once as plain functions. The adapter acks every
+    request on the event loop as soon as it arrives and runs the listener body on
+    its workload's pool with sync ``say``/``respond``/``client`` helpers, so a
+    slow listener never holds up the Socket Mode connection or another ack.
+    """
+
+    is_async = True
+
+    def __init__(self, token: str | None, **app_kwargs):
+        from slack_bolt.async_app import AsyncApp
+
+        if api_url_kwargs():
+            from slack_sdk.web.async_client import AsyncWebClient
+
+            client = AsyncWebClient(token=token, **api_url_kwargs())
+            self.async_app = AsyncApp(client=client, **app_kwargs)
+        else:
+            self.async_app = AsyncApp(token=token, **app_kwargs)
+        if recorder.enabled():
+            self.async_app.use(recorder.async_middleware)
+        self.async_app.use(dedup.async_middleware)
+        self.client = BotWebClient(token=token, **api_url_kwargs())
+
+    def _sync_kwargs(self, arg_names, payload, body, context) -> dict:
+        """Build the keyword arguments a sync listener asks for."""
+        channel_id = context.channel_id
+        thread_ts = context.get("thread_ts")
+        available = {
+            "ack": _noop_ack,
+            "body": body,
+            "payload": payload,
+            "command": payload,
+            "event": payload,
+            "message": payload,
+            "view": payload,
+            "action": payload,
+            "context": context,
+            "client": self.client,
+            "logger": context.logger,
+            "say": Say(client=self.client, channel=channel_id, thread_ts=thread_ts),
+            "respond": Respond(response_url=context.response_url),
+            "set_status": SetStatus(self.client, channel_id, thread_ts),
+            "set_suggested_prompts": SetSuggestedPrompts(
+                self.client, channel_id, thread_ts
+            ),
+        }
+        if arg_names is None:
+            return available
+        return {name: available[name] for name in arg_names if name in available}
+
+    def wrap(self, func, workload: str | None = "instant", name: str = ""):
+        """Turn a sync listener into a coroutine that acks first, then offloads.
+
+        ``workload=None`` runs ``func`` on the event loop, for listeners that
+        only hand work on.
+        """
+        arg_names = _arg_names(func)
+
+        @functools.wraps(func)
+        async def listener(ack, payload, body, context, respond):
+            await ack()
+            kwargs = self._sync_kwargs(arg_names, payload, body, context)
+            if workload is None:
+                func(**kwargs)
+                return
+            try:
+                future = executors.pool(workload).submit(func, **kwargs)
+            except executors.Busy:
+                if _shed(workload, name, context.response_url):
+                    await respond(text=BUSY_TEXT, response_type="ephemeral")
+                return
+            await asyncio.wrap_future(future)
+
+        # Bolt inspects the unwrapped signature to inject arguments; the
+        # coroutine's own parameters are the ones it needs to receive.
+        del listener.__wrapped__
+        return listener
+
+    def _decorator(self, kind, name, workload, register):
+        return _instrumented(
+            kind, name, lambda func: register(self.wrap(func, workload, str(name)))
+        )
+
+    def command(self, command, *args, workload="instant", **kwargs):
+        return self._decorator(
+            "command", command, workload, self.async_app.command(command, *args, **kwargs)
+        )
+
+    def event(self, event, *args, workload="instant", **kwargs):
+        return self._decorator(
+            "event", event, workload, self.async_app.event(event, *args, **kwargs)
+        )
+
+    def action(self, constraints, *args, workload="instant", **kwargs):
+        return self._decorator(
+            "action",
+            constraints,
+            workload,
+            self.async_app.action(constraints, *args, **kwargs),
+        )
+
+    def view(self, constraints, *args, workload="instant", **kwargs):
+        return self._decorator(
+            "view", constraints, workload, self.async_app.view(constraints, *args, **kwargs)
+        )
+
+    def use(self, middleware):
+        if isinstance(middleware, _AsyncAssistantAdapter):
+            middleware = middleware.assistant
+        self.async_app.use(middleware)
+
+
+class _AsyncAssistantAdapter:
+    """Sync-style ``Assistant`` decorators backed by ``AsyncAssistant``."""
+
+    def __init__(self, app: AsyncAppAdapter):
+        from slack_bolt.middleware.assistant.async_assistant import AsyncAssistant
+
+        self.app = app
+        self.assistant = AsyncAssistant()
+
+    def thread_started(self, func):
+        self.assistant.thread_started(self.app.wrap(func, name="thread_started"))
+        return func
+
+    def user_message(self, func):
+        self.assistant.user_message(self.app.wrap(func, "ai", "user_message"))
+        return func
+
+
+def new_assistant(app):
+    """Create an ``Assistant`` that matches the app's runtime."""
+    if getattr(app, "is_async", False):
+        return _AsyncAssistantAdapter(app)
+    return Assistant()
+
+
+def create_app(token: str | None, runtime: str | None = None, **app_kwargs):
+    """Create the Bolt app for the selected runtime (``sync`` or ``async``).
+
+    Defaults to the ``BOT_RUNTIME`` environment variable. Extra keyword arguments
+    are passed through to ``App``/``AsyncApp``.
+    """
+    runtime = (runtime or os.getenv("BOT_RUNTIME", "sync")).lower()
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown BOT_RUNTIME {runtime!r}, expected one of {RUNTIMES}")
+    logger.info(f"Using {runtime} runtime")
+    if runtime == "async":
+        return AsyncAppAdapter(token, **app_kwargs)
+    app = BotApp(client=BotWebClient(token=token, **api_url_kwargs()), **app_kwargs)
+    if recorder.enabled():
+        app.use(recorder.middleware)
+    app.use(dedup.middleware)
+    return app
+
+
+def start(app, app_token: str):
+    """Open the Socket Mode connection and block until the process is stopped."""
+    if getattr(app, "is_async", False):
+        from slack_bolt.adapter.socket_mode.async_handler import (
+            AsyncSocketModeHandler,
+        )
+
+        handler = AsyncSocketModeHandler(app.async_app, app_token)
+        asyncio.run(handler.start_async())
+        return
+
+    from slack_bolt.adapter.socket_mode import SocketModeHandler
+
+    handler = SocketModeHandler(app, app_token)
+    handler.start()
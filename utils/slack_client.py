@@ -0,0 +1,196 @@
+import functools
+import logging
+import os
+import threading
+import time
+
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError, SlackClientError
+
+from utils import metrics, thread_index, transcripts
+
+logger = logging.getLogger(__name__)
+
+# Requests per minute Slack allows per workspace for each Web API tier.
+TIERS = {1: 1, 2: 20, 3: 50, 4: 100}
+# Tiers of the methods the bot calls; methods not listed are only throttled
+# after Slack answers them with a 429.
+METHOD_TIERS = {
+    "chat.delete": 3,
+    "chat.update": 3,
+    "conversations.invite": 3,
+    "conversations.replies": 3,
+    "files.completeUploadExternal": 4,
+    "files.getUploadURLExternal": 4,
+    "reactions.add": 3,
+    "usergroups.users.list": 2,
+    "usergroups.users.update": 2,
+    "users.info": 4,
+    "views.open": 4,
+}
+# chat.postMessage is limited per channel: about one message a second, with short bursts.
+POST_MESSAGE_RATE = 1.0
+POST_MESSAGE_BURST = 3
+RATE_LIMIT_RETRIES = 3
+# Methods whose successful calls put the bot into a thread.
+POSTING_METHODS = frozenset({"chat.postMessage", "files.completeUploadExternal"})
+
+
+class RateLimited(SlackClientError):
+    """Raised instead of queueing a call that would wait longer than ``SLACK_MAX_WAIT``."""
+
+
+class TokenBucket:
+    """``rate`` tokens a second up to ``burst``; callers reserve tokens in arrival order.
+
+    The balance may go negative: each caller takes the next free slot and sleeps
+    until it comes up, so waiting callers form a queue without a queue thread.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float) -> float | None:
+        """Take a token; seconds to wait before using it, or None if over ``max_wait``."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def ready(self) -> bool:
+        """Whether a token is free right now; nothing is taken."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens >= 1
+
+    def pause(self, seconds: float):
+        """Hand out no tokens for ``seconds`` (Slack's ``Retry-After``), then refill."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class RateLimiter:
+    """Token buckets per Web API tier and per channel for ``chat.postMessage``."""
+
+    def __init__(self, scale: float = 1.0, workers: int = 1, max_wait: float = 30.0):
+        self.scale = scale
+        self.workers = workers
+        self.max_wait = max_wait
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, method: str, channel: str | None) -> TokenBucket:
+        if method == "chat.postMessage" and channel:
+            key = f"{method}:{channel}"
+            rate, burst = POST_MESSAGE_RATE * self.scale, POST_MESSAGE_BURST * self.scale
+        elif method in METHOD_TIERS:
+            per_minute = TIERS[METHOD_TIERS[method]] * self.scale / self.workers
+            key, rate, burst = method, per_minute / 60, max(1.0, per_minute)
+        else:
+            # Unlimited until Slack says otherwise; ``pause`` then throttles it.
+            key, rate, burst = method, 1000.0, 1000.0
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, burst)
+            return bucket
+
+    def wait(self, method: str, bucket: TokenBucket):
+        """Block until ``bucket`` has a token for ``method``."""
+        waited = bucket.reserve(self.max_wait)
+        if waited is None:
+            metrics.inc("slack_rate_limit_dropped_total", method=method)
+            raise RateLimited(f"{method} is rate limited for over {self.max_wait:.0f}s")
+        if waited:
+            metrics.gauge("slack_queue_depth", 1, method=method)
+            try:
+                time.sleep(waited)
+            finally:
+                metrics.gauge("slack_queue_depth", -1, method=method)
+        metrics.observe("slack_throttle", method, waited)
+
+
+@functools.cache
+def limiter() -> RateLimiter:
+    """The process-wide limiter shared by every ``BotWebClient``.
+
+    Tier budgets are per workspace, so with ``BOT_WORKERS`` processes each takes
+    its share. Channels are sharded to one worker, so per-channel limits stay whole.
+    """
+    return RateLimiter(
+        scale=float(os.getenv("SLACK_RATE_SCALE", "1")),
+        workers=max(1, int(os.getenv("BOT_WORKERS", "1"))),
+        max_wait=float(os.getenv("SLACK_MAX_WAIT", "30")),
+    )
+
+
+def _retry_after(error: SlackApiError) -> float | None:
+    """Seconds Slack asked us to back off, or None if ``error`` is not a 429."""
+    if error.response.status_code != 429:
+        return None
+    return float(error.response.headers.get("Retry-After", 1))
+
+
+def _record_post(params: dict, response):
+    """Index the thread a post went to and add the message to its transcript.
+
+    A top-level post starts its own thread.
+    """
+    channel = params.get("channel") or params.get("channel_id")
+    thread_ts = params.get("thread_ts") or response.get("ts")
+    thread_index.index().add(channel, thread_ts)
+    if response.get("message"):
+        transcripts.cache().add(response.get("channel", channel), response["message"])
+
+
+class BotWebClient(WebClient):
+    """``WebClient`` that paces calls to Slack's rate limits and records them per method.
+
+    Calls wait their turn in ``limiter()`` rather than fail, and a 429 pauses the
+    method (or channel) for ``Retry-After`` before the call is retried. Every
+    thread the bot posts in is added to ``thread_index.index()``, and its messages
+    to ``transcripts.cache()``.
+    """
+
+    def api_call(self, api_method: str, **kwargs):
+        params = kwargs.get("json") or kwargs.get("data") or kwargs.get("params") or {}
+        rate_limiter = limiter()
+        bucket = rate_limiter.bucket(api_method, params.get("channel"))
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            rate_limiter.wait(api_method, bucket)
+            try:
+                with metrics.track("slack_api", api_method):
+                    response = super().api_call(api_method, **kwargs)
+                if api_method in POSTING_METHODS:
+                    _record_post(params, response)
+                return response
+            except SlackApiError as e:
+                retry_after = _retry_after(e)
+                if retry_after is None or attempt == RATE_LIMIT_RETRIES:
+                    raise
+                metrics.inc("slack_ratelimited_total", method=api_method)
+                logger.warning(
+                    "%s rate limited by Slack, retrying in %.0fs",
+                    api_method,
+                    retry_after,
+                )
+                bucket.pause(retry_after)
+
+
+def api_url_kwargs() -> dict:
+    """``base_url`` for Web API clients when ``SLACK_API_URL`` points at a stand-in server."""
+    url = os.getenv("SLACK_API_URL")
+    return {"base_url": url.rstrip("/") + "/"} if url else {}
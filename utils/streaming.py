@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import time
+
+from slack_sdk.errors import SlackClientError
+
+from utils import metrics, slack_client
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = "_Thinking…_"
+# Shown after the text while more is on its way.
+CURSOR = " ▍"
+
+
+def iter_sse(response):
+    """Yield the JSON ``data`` of each server-sent event in a streamed ``requests`` response.
+
+    Stops at the OpenAI-style ``[DONE]`` sentinel.
+    """
+    response.encoding = "utf-8"
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:") :].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except ValueError:
+            logger.warning("Skipping malformed stream event: %.100s", data)
+
+
+class StreamingReply:
+    """A Slack message that fills in as a reply streams.
+
+    ``start`` posts a placeholder at once. While text arrives, ``update`` edits
+    the message when ``due`` says so: at most every ``interval`` seconds, and only
+    while ``chat.update`` has a rate-limit token free, so the stream never waits on
+    Slack. ``finish`` writes the final text. The first edit that shows any text
+    records ``ai_first_token`` for ``name``, timed from when the reply was created.
+    """
+
+    def __init__(
+        self, client, channel: str, thread_ts: str | None = None, name: str = "ai"
+    ):
+        self.client = client
+        self.channel = channel
+        self.thread_ts = thread_ts
+        self.name = name
+        self.interval = float(os.getenv("AI_STREAM_UPDATE_SECONDS", "1"))
+        self.ts = None
+        # The posted message as Slack returned it, with the latest text.
+        self.message: dict = {}
+        self._created = time.monotonic()
+        self._edited = 0.0
+        self._shown = None
+
+    def start(self):
+        response = self.client.chat_postMessage(
+            channel=self.channel, thread_ts=self.thread_ts, text=PLACEHOLDER
+        )
+        self.ts = response["ts"]
+        self.channel = response.get("channel", self.channel)
+        self.message = dict(response.get("message") or {}, ts=self.ts)
+        if self.thread_ts:
+            self.message["thread_ts"] = self.thread_ts
+
+    def due(self) -> bool:
+        if time.monotonic() - self._edited < self.interval:
+            return False
+        return slack_client.limiter().bucket("chat.update", self.channel).ready()
+
+    def _edit(self, text: str):
+        self.client.chat_update(channel=self.channel, ts=self.ts, text=text)
+        self._edited = time.monotonic()
+        if self._shown is None:
+            metrics.observe("ai_first_token", self.name, self._edited - self._created)
+        self._shown = text
+
+    def update(self, text: str):
+        """Show ``text`` so far; a failed edit is skipped, the next one catches up."""
+        if not text or text + CURSOR == self._shown:
+            return
+        try:
+            self._edit(text + CURSOR)
+        except SlackClientError as e:
+            logger.debug("Skipping streamed update: %s", e)
+
+    def finish(self, text: str):
+        self._edit(text)
+        self.message["text"] = text
@@ -0,0 +1,110 @@
+import fcntl
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from utils import workers
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 60
+
+
+class ThreadIndex:
+    """``(channel, thread_ts)`` pairs the bot has posted in, bounded by LRU and TTL.
+
+    Entries map to the wall-clock time of the bot's latest post so they can be
+    saved to ``path`` and keep their remaining lifetime across restarts.
+    """
+
+    def __init__(self, path: str, maxsize: int, ttl: float):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._threads = TTLCache("bot_threads", maxsize, ttl)
+        self._dirty = threading.Event()
+
+    def add(self, channel: str | None, thread_ts: str | None):
+        """Record that the bot posted in ``thread_ts`` (a thread root's ts)."""
+        if channel and thread_ts:
+            self._threads.set((channel, thread_ts), time.time())
+            self._dirty.set()
+
+    def __contains__(self, key: tuple) -> bool:
+        return self._threads.get(key) is not None
+
+    def _live(self, entries) -> list:
+        """Entries younger than ``ttl``, newest ``maxsize`` of them, oldest first."""
+        cutoff = time.time() - self.ttl
+        latest = {}
+        for channel, thread_ts, posted in entries:
+            if posted > cutoff and posted > latest.get((channel, thread_ts), 0):
+                latest[(channel, thread_ts)] = posted
+        ordered = sorted(latest.items(), key=lambda item: item[1])[-self.maxsize :]
+        return [
+            [channel, thread_ts, posted] for (channel, thread_ts), posted in ordered
+        ]
+
+    def _read(self) -> list:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable thread index {self.path}: {e}")
+            return []
+
+    def load(self):
+        now = time.time()
+        for channel, thread_ts, posted in self._live(self._read()):
+            self._threads.set((channel, thread_ts), posted, ttl=posted + self.ttl - now)
+        logger.info(f"Loaded {len(self._threads)} bot threads from {self.path}")
+
+    def save(self):
+        """Merge this process's threads into ``path``; worker processes share the file."""
+        if not self._dirty.is_set():
+            return
+        self._dirty.clear()
+        mine = [
+            [channel, ts, posted] for (channel, ts), posted in self._threads.items()
+        ]
+        try:
+            with open(f"{self.path}.lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                entries = self._live(self._read() + mine)
+                with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(f"{self.path}.tmp", self.path)
+        except OSError as e:
+            self._dirty.set()
+            logger.error(f"Failed to save thread index: {e}")
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.save()
+
+
+@functools.cache
+def index() -> ThreadIndex:
+    """The process-wide index, loaded from ``BOT_THREADS_PATH`` and saved back every minute.
+
+    An empty ``BOT_THREADS_PATH`` keeps the index in memory only.
+    """
+    threads = ThreadIndex(
+        os.getenv("BOT_THREADS_PATH", "bot_threads.json"),
+        maxsize=int(os.getenv("BOT_THREADS_SIZE", "50000")),
+        ttl=float(os.getenv("BOT_THREADS_TTL", str(7 * 24 * 3600))),
+    )
+    if threads.path:
+        threads.load()
+        threading.Thread(
+            target=threads._flush_forever, name="thread-index", daemon=True
+        ).start()
+        workers.at_exit(threads.save)
+    return threads
@@ -0,0 +1,162 @@
+import bisect
+import functools
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from utils import metrics
+from utils.cache import ENTRY_OVERHEAD
+
+MENTION_PATTERN = re.compile(r"<@[A-Z0-9]+>")
+# Messages kept per thread: the root plus the most recent replies.
+MAX_MESSAGES = 20
+
+
+def to_entry(message: dict) -> dict | None:
+    """A Slack message as a chat-completions turn, or None if it has no text.
+
+    Bot messages are the assistant's turns; mentions are stripped from user turns.
+    """
+    text = message.get("text", "")
+    if message.get("bot_id") is None:
+        role = "user"
+        text = MENTION_PATTERN.sub("", text).strip()
+    else:
+        role = "assistant"
+    if not text:
+        return None
+    return {"ts": message.get("ts", ""), "role": role, "content": text}
+
+
+class Transcript:
+    """One thread's turns in ``ts`` order."""
+
+    __slots__ = ("entries", "size")
+
+    def __init__(self):
+        self.entries: list[dict] = []
+        self.size = 0
+
+    def add(self, entry: dict, replace: bool = False) -> int:
+        """Insert ``entry`` unless its ``ts`` is present (``replace`` overwrites it).
+
+        Returns the size change.
+        """
+        before = self.size
+        at = bisect.bisect_left(self.entries, entry["ts"], key=lambda e: e["ts"])
+        if at < len(self.entries) and self.entries[at]["ts"] == entry["ts"]:
+            if not replace:
+                return 0
+            self.size -= len(self.entries.pop(at)["content"]) + ENTRY_OVERHEAD
+        self.entries.insert(at, entry)
+        self.size += len(entry["content"]) + ENTRY_OVERHEAD
+        while len(self.entries) > MAX_MESSAGES:
+            dropped = self.entries.pop(1)
+            self.size -= len(dropped["content"]) + ENTRY_OVERHEAD
+        return self.size - before
+
+
+class TranscriptCache:
+    """Per-thread transcripts kept current from the message stream, LRU-evicted by size.
+
+    A thread is fetched from Slack once, on its first ``get``; after that new
+    messages are appended as they arrive and edits replace them in place. A
+    delete drops the thread so the next ``get`` reconciles with Slack.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        # (channel, thread_ts) -> Transcript, least recently used first
+        self._threads: OrderedDict = OrderedDict()
+
+    def _add(self, transcript: Transcript, message: dict, replace: bool = False):
+        """Add ``message`` to ``transcript``. Caller holds the lock."""
+        entry = to_entry(message)
+        if entry is not None:
+            self.size += transcript.add(entry, replace)
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self._threads) > 1:
+            _, transcript = self._threads.popitem(last=False)
+            self.size -= transcript.size
+
+    def add(self, channel: str, message: dict, replace: bool = False):
+        """Append a thread reply if its thread is cached; other messages are ignored.
+
+        ``replace`` overwrites a message already there, e.g. after the bot edits it.
+        """
+        key = (channel, message.get("thread_ts"))
+        with self._lock:
+            transcript = self._threads.get(key)
+            if transcript is not None:
+                self._add(transcript, message, replace)
+                self._evict()
+
+    def invalidate(self, channel: str, thread_ts: str | None):
+        with self._lock:
+            transcript = self._threads.pop((channel, thread_ts), None)
+            if transcript is not None:
+                self.size -= transcript.size
+
+    def _store(self, key, messages: list[dict]) -> list[dict]:
+        transcript = Transcript()
+        with self._lock:
+            old = self._threads.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            for message in messages:
+                self._add(transcript, message)
+            self._threads[key] = transcript
+            self._evict()
+            return list(transcript.entries)
+
+    def get(
+        self, client, channel: str, thread_ts: str, current: dict | None = None
+    ) -> list:
+        """The thread's turns as ``{"role", "content"}`` dicts, oldest first.
+
+        ``current`` is the message being answered; it is added in case the
+        message stream has not delivered it yet. A new thread whose root is
+        ``current`` needs no fetch at all.
+        """
+        key = (channel, thread_ts)
+        with self._lock:
+            transcript = self._threads.get(key)
+            if transcript is not None:
+                self._threads.move_to_end(key)
+                if current is not None:
+                    self._add(transcript, current)
+                    self._evict()
+                entries = list(transcript.entries)
+        metrics.inc(
+            "cache_requests_total",
+            cache="transcripts",
+            result="miss" if transcript is None else "hit",
+        )
+        if transcript is None:
+            if (
+                current is not None
+                and current.get("ts") == thread_ts
+                and not current.get("thread_ts")
+            ):
+                messages = [current]
+            else:
+                replies = client.conversations_replies(
+                    channel=channel, ts=thread_ts, limit=MAX_MESSAGES
+                )
+                messages = replies.get("messages", [])
+                if current is not None:
+                    messages.append(current)
+            entries = self._store(key, messages)
+        return [{"role": e["role"], "content": e["content"]} for e in entries]
+
+
+@functools.cache
+def cache() -> TranscriptCache:
+    """The process-wide transcript cache, bounded by ``TRANSCRIPT_CACHE_BYTES``."""
+    return TranscriptCache(
+        int(os.getenv("TRANSCRIPT_CACHE_BYTES", str(16 * 1024 * 1024)))
+    )
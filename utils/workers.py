@@ -0,0 +1,224 @@
+import asyncio
+import atexit
+import functools
+import logging
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.managers
+import os
+import signal
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 1000
+# Expired cooldowns are swept after this many claims.
+COOLDOWN_PRUNE_EVERY = 1000
+
+# (pid, func) pairs registered through ``at_exit``.
+_exit_hooks: list = []
+
+
+def at_exit(func):
+    """Run ``func`` when this process exits, forked workers included.
+
+    Workers leave through ``os._exit``, which skips ``atexit``; ``worker_main``
+    runs the hooks its own process registered instead.
+    """
+    atexit.register(func)
+    _exit_hooks.append((os.getpid(), func))
+
+
+def _run_exit_hooks():
+    pid = os.getpid()
+    for owner, func in reversed(_exit_hooks):
+        if owner == pid:
+            try:
+                func()
+            except Exception as e:
+                logger.error(f"Exit hook {func.__qualname__} failed: {e}")
+
+
+class Cooldowns:
+    """Per-key cooldowns, e.g. one XP award per user per window.
+
+    ``claim`` checks and starts a cooldown in one step, so two threads, or two
+    workers, cannot both claim the same window.
+    """
+
+    def __init__(self):
+        self._until: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._claims = 0
+
+    def claim(self, key: str, seconds: float) -> bool:
+        """Start ``key``'s cooldown and return True, unless one is still running."""
+        now = time.monotonic()
+        with self._lock:
+            if self._until.get(key, 0.0) > now:
+                return False
+            self._until[key] = now + seconds
+            self._claims += 1
+            if self._claims % COOLDOWN_PRUNE_EVERY == 0:
+                self._until = {k: until for k, until in self._until.items() if until > now}
+            return True
+
+
+class _StateManager(multiprocessing.managers.BaseManager):
+    """Process holding state that every worker shares."""
+
+
+_StateManager.register("Cooldowns", Cooldowns)
+
+# Set in the supervisor before forking, so workers inherit proxies to the shared state.
+_manager = None
+_shared_cooldowns = None
+
+
+@functools.cache
+def _local_cooldowns() -> Cooldowns:
+    return Cooldowns()
+
+
+def cooldowns():
+    """The ``Cooldowns`` for this bot: shared by all workers, or in-process without them."""
+    return _shared_cooldowns if _shared_cooldowns is not None else _local_cooldowns()
+
+
+def _start_state_manager(context):
+    global _manager, _shared_cooldowns
+    _manager = _StateManager(ctx=context)
+    # Ctrl-C reaches the whole process group; the manager must outlive the workers' exit hooks.
+    _manager.start(initializer=signal.signal, initargs=(signal.SIGINT, signal.SIG_IGN))
+    _shared_cooldowns = _manager.Cooldowns()
+
+
+def shard_key(payload: dict) -> str:
+    """Pick the id that owns an envelope: its channel, else the acting user.
+
+    Everything from one channel lands on the same worker, so per-channel state
+    holds without cross-process coordination. The worker still runs a channel's
+    events concurrently, so they are not handled in order.
+    """
+    event = payload.get("event")
+    if event:
+        channel = event.get("channel") or event.get("item", {}).get("channel")
+        if isinstance(channel, dict):
+            channel = channel.get("id")
+        return channel or event.get("user") or ""
+    if payload.get("channel_id"):
+        return payload["channel_id"]
+    channel = payload.get("channel")
+    if isinstance(channel, dict) and channel.get("id"):
+        return channel["id"]
+    user = payload.get("user")
+    if isinstance(user, dict):
+        return user.get("id", "")
+    return payload.get("user_id") or ""
+
+
+def shard_for(payload: dict, workers: int) -> int:
+    """Stable worker index for an envelope (``hash()`` differs between processes)."""
+    return zlib.crc32(shard_key(payload).encode()) % workers
+
+
+def bolt_dispatcher(app):
+    """Return ``dispatch(body)`` that feeds a Socket Mode payload to the app."""
+    if getattr(app, "is_async", False):
+        from slack_bolt.request.async_request import AsyncBoltRequest
+
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="worker-loop", daemon=True).start()
+
+        def dispatch(body):
+            asyncio.run_coroutine_threadsafe(
+                app.async_app.async_dispatch(
+                    AsyncBoltRequest(body=body, mode="socket_mode")
+                ),
+                loop,
+            ).result()
+
+        return dispatch
+
+    from slack_bolt import BoltRequest
+
+    return lambda body: app.dispatch(BoltRequest(body=body, mode="socket_mode"))
+
+
+def worker_main(index: int, queue, dispatch):
+    """Dispatch envelopes from ``queue`` in order until a ``None`` arrives."""
+    from utils import metrics
+
+    port = int(os.getenv("METRICS_PORT", "9100"))
+    if port:
+        metrics.start_server(port=port + 1 + index)
+    logger.info(f"Worker {index} started (pid {os.getpid()})")
+    try:
+        while True:
+            body = queue.get()
+            if body is None:
+                return
+            try:
+                dispatch(body)
+            except Exception as e:
+                logger.error(f"Worker {index} failed to dispatch envelope: {e}")
+    finally:
+        _run_exit_hooks()
+
+
+def start_workers(count: int, make_dispatch):
+    """Fork ``count`` workers, each running ``make_dispatch()`` over its own queue.
+
+    Workers are forked so they inherit the already-registered app; start them
+    before opening any connections or threads in the supervisor. State they must
+    agree on, such as ``cooldowns()``, lives in a manager process started first.
+    """
+    context = multiprocessing.get_context("fork")
+    _start_state_manager(context)
+    queues = [context.Queue(maxsize=QUEUE_SIZE) for _ in range(count)]
+    processes = [
+        context.Process(
+            target=lambda i=i: worker_main(i, queues[i], make_dispatch()),
+            name=f"worker-{i}",
+            daemon=True,
+        )
+        for i in range(count)
+    ]
+    for process in processes:
+        process.start()
+    return queues, processes
+
+
+def run_supervisor(app, app_token: str, count: int, on_start=None):
+    """Own the Socket Mode connection and shard envelopes across ``count`` workers.
+
+    The supervisor acks every envelope as soon as it arrives (no listener here
+    acks with a payload), then hands it to the worker that owns its channel.
+    ``on_start`` runs once the workers are forked, for services that start
+    threads. Exits when any worker dies so the process manager can restart the bot.
+    """
+    from slack_sdk.socket_mode.builtin import SocketModeClient
+    from slack_sdk.socket_mode.response import SocketModeResponse
+
+    queues, processes = start_workers(count, lambda: bolt_dispatcher(app))
+    if on_start:
+        on_start()
+
+    def handle(client, req):
+        client.send_socket_mode_response(SocketModeResponse(envelope_id=req.envelope_id))
+        if req.payload:
+            queues[shard_for(req.payload, count)].put(req.payload)
+
+    client = SocketModeClient(app_token=app_token, web_client=app.client)
+    client.socket_mode_request_listeners.append(handle)
+    client.connect()
+    logger.info(f"Supervisor connected, sharding events across {count} workers")
+
+    sentinels = [process.sentinel for process in processes]
+    multiprocessing.connection.wait(sentinels)
+    dead = [process.name for process in processes if not process.is_alive()]
+    logger.error(f"Worker(s) {', '.join(dead)} exited, shutting down")
+    client.close()
+    raise SystemExit(1)